@@ -1,10 +1,25 @@
 # analysis/aggregate_results.py
-import argparse, glob, sys
+import argparse, glob, json, os, sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 import pyarrow.parquet as pq
 
+INDEX = Path('results/dataset/runs.parquet')  # written by mcpbench.dataset
+CACHE = Path('tables/summary_cache.parquet')  # per-file summaries keyed by (path, size, mtime_ns)
+RAW_COLS = ['op', 'start', 'end', 'latency_ms', 'response_ms', 'staleness_ms', 'versions_behind', 'conflict', 'retries']
+SUMMARY_COLS = ['run_id', 'p50', 'p95', 'p99', 'p95_response', 'p99_response', 'throughput_ops_s',
+                'staleness_ms_mean', 'versions_behind_mean', 'conflict_rate', 'retries_per_write']
+
+def load_index(filters=None):
+    """Run-index rows matching `filters` (pushed down into the parquet read), or None without an index."""
+    if not INDEX.exists():
+        return None
+    return pq.read_table(INDEX, columns=['run_id', 'fragment', 'wire_bytes', 'messages', 'batch_mean', 'cfg'],
+                         filters=filters or None).to_pandas()
+
 def is_valid_parquet(path: Path) -> bool:
     try:
         if not path.is_file() or path.stat().st_size < 16:
@@ -14,65 +29,209 @@ def is_valid_parquet(path: Path) -> bool:
     except Exception:
         return False
 
-def per_run(df: pd.DataFrame, rid: str) -> dict:
-    duration_s = max(1.0, (df['end'].max() - df['start'].min()))
-    lat = df['latency_ms'].values
+def per_run(t: pa.Table, rid: str) -> dict:
+    # Arrow kernels over the needed columns only; quantiles interpolate linearly like np.percentile
+    duration_s = max(1.0, pc.max(t['end']).as_py() - pc.min(t['start']).as_py())
+    lat = t['latency_ms']
+    # response time from the intended (scheduled) start: corrected for coordinated omission
+    resp = t['response_ms'] if 'response_ms' in t.column_names else lat
+    p50, p95, p99 = pc.quantile(lat, q=[0.50, 0.95, 0.99]).to_pylist()
+    r95, r99 = pc.quantile(resp, q=[0.95, 0.99]).to_pylist()
+
+    def mean(col, op=None):
+        if col not in t.column_names:
+            return 0.0
+        v = t[col] if op is None else t[col].filter(pc.equal(t['op'], op))
+        return float(pc.mean(v.cast(pa.float64())).as_py() or 0.0)
+
     return {
         'run_id': rid,
-        'p50': float(np.percentile(lat, 50)),
-        'p95': float(np.percentile(lat, 95)),
-        'p99': float(np.percentile(lat, 99)),
-        'throughput_ops_s': float(len(df) / duration_s),
-        'staleness_ms_mean': float(df.get('staleness_ms', pd.Series([0])).mean()),
-        'conflict_rate': float(df.get('conflict', pd.Series([0])).mean()),
+        'p50': p50,
+        'p95': p95,
+        'p99': p99,
+        'p95_response': r95,
+        'p99_response': r99,
+        'throughput_ops_s': float(t.num_rows / duration_s),
+        'staleness_ms_mean': mean('staleness_ms'),
+        'versions_behind_mean': mean('versions_behind', 'read'),
+        'conflict_rate': mean('conflict'),
+        'retries_per_write': mean('retries', 'write'),
     }
 
+def per_run_sketch(sk: dict, rid: str) -> dict:
+    # Same columns as per_run, from the histograms Metrics writes at run time (±1% on quantiles)
+    from mcpbench.sketch import LogHistogram
+    def merged(metric):
+        hs = [LogHistogram.from_dict(d) for d in sk['hist'][metric].values()]
+        for h in hs[1:]:
+            hs[0].merge(h)
+        return hs[0]
+    lat, resp, stale = merged('latency_ms'), merged('response_ms'), merged('staleness_ms')
+    duration_s = max(1.0, sk['t_max'] - sk['t_min'])
+    return {
+        'run_id': rid,
+        'p50': lat.quantile(0.50),
+        'p95': lat.quantile(0.95),
+        'p99': lat.quantile(0.99),
+        'p95_response': resp.quantile(0.95),
+        'p99_response': resp.quantile(0.99),
+        'throughput_ops_s': float(sk['count'] / duration_s),
+        'staleness_ms_mean': stale.mean(),
+        'versions_behind_mean': LogHistogram.from_dict(sk['hist']['versions_behind']['read']).mean() if 'versions_behind' in sk['hist'] else 0.0,
+        'conflict_rate': float(sk['conflicts'] / sk['count']),
+        'retries_per_write': float(sk.get('retries', 0) / max(1, sk['hist']['latency_ms']['write']['total'])),
+    }
+
+def summarize(task):
+    """Worker: (rid, path, from_sketches) -> summary row, or None for a bad/empty input."""
+    rid, p, from_sketches = task
+    if from_sketches:
+        try:
+            sk = json.loads(Path(p).read_text())
+        except Exception as e:
+            print(f"[WARN] Skipping unreadable sketch: {p} ({e})", file=sys.stderr)
+            return None
+        return per_run_sketch(sk, rid) if sk.get('count') else None
+    path = Path(p)
+    if not is_valid_parquet(path):
+        return None
+    try:
+        names = set(pq.read_schema(path).names)
+        if 'latency_ms' not in names:
+            return None
+        t = pq.read_table(path, columns=[c for c in RAW_COLS if c in names])
+    except Exception as e:
+        print(f"[WARN] Skipping unreadable parquet: {p} ({e})", file=sys.stderr)
+        return None
+    return per_run(t, rid) if t.num_rows else None
+
+def _stat_key(p):
+    try:
+        st = os.stat(p)
+        return st.st_size, st.st_mtime_ns
+    except OSError:
+        return None
+
+def load_cache(path: Path) -> dict:
+    """path -> (size, mtime_ns, summary row); an unreadable cache is just rebuilt."""
+    if not path.exists():
+        return {}
+    try:
+        df = pd.read_parquet(path)
+    except Exception as e:
+        print(f"[WARN] Ignoring unreadable summary cache: {path} ({e})", file=sys.stderr)
+        return {}
+    return {r['path']: (r['size'], r['mtime_ns'], {k: r[k] for k in SUMMARY_COLS})
+            for r in df.to_dict('records')}
+
+def save_cache(path: Path, cache: dict):
+    rows = [{'path': p, 'size': size, 'mtime_ns': mtime, **row}
+            for p, (size, mtime, row) in sorted(cache.items()) if os.path.exists(p)]
+    if not rows:
+        return
+    tmp = path.with_name(path.name + f'.{os.getpid()}.tmp')
+    pd.DataFrame(rows).to_parquet(tmp, index=False, compression='zstd')
+    os.replace(tmp, path)
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument('--raw', default='results/raw/*.parquet')
+    ap.add_argument('--sketches', default='results/agg/*.sketch.json')
+    ap.add_argument('--from-sketches', action='store_true',
+                    help='Summarise runs from run-time histograms instead of re-reading raw parquet')
+    ap.add_argument('--strategy', help='Only runs of this strategy (needs the run index)')
+    ap.add_argument('--agents', type=int, help='Only runs with this agent count (needs the run index)')
+    ap.add_argument('--workload', help='Only runs of this workload type (needs the run index)')
+    ap.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                    help='Processes summarising new or changed runs')
+    ap.add_argument('--cache', default=str(CACHE), help='Per-file summary cache')
+    ap.add_argument('--no-cache', action='store_true', help='Recompute every run and leave the cache untouched')
     ap.add_argument('--out', default='tables/summary.csv')
     args = ap.parse_args()
 
-    files = sorted(glob.glob(args.raw))
+    filters = [(k, '=', v) for k, v in (('strategy', args.strategy), ('agents', args.agents),
+                                        ('workload', args.workload)) if v is not None]
+    index = load_index(filters)
+    if index is None and filters:
+        raise SystemExit(f"--strategy/--agents/--workload need {INDEX} (python -m mcpbench.dataset results)")
+    if filters:
+        files = [(rid, f"results/agg/{rid}.sketch.json" if args.from_sketches else str(INDEX.parent/frag))
+                 for rid, frag in zip(index['run_id'], index['fragment'])]
+    elif args.from_sketches:
+        files = [(Path(p).name[:-len('.sketch.json')], p) for p in sorted(glob.glob(args.sketches))]
+    else:
+        files = [(Path(p).stem, p) for p in sorted(glob.glob(args.raw))]
+    # Unfiltered runs come from --raw/--sketches; the index only supplies their configs
+    if index is not None and not filters:
+        unindexed = sorted({rid for rid, _ in files} - set(index['run_id']))
+        if unindexed:
+            print(f"[WARN] {len(unindexed)} run(s) not in {INDEX} (e.g. {unindexed[0]}); "
+                  f"their configs come from manifests", file=sys.stderr)
     Path('tables').mkdir(exist_ok=True)
 
-    rows = []
-    bad = []
-    for p in files:
-        path = Path(p)
-        if not is_valid_parquet(path):
-            bad.append(p); continue
-        try:
-            df = pd.read_parquet(p, engine='pyarrow')
-        except Exception as e:
-            print(f"[WARN] Skipping unreadable parquet: {p} ({e})", file=sys.stderr)
-            bad.append(p); continue
-        if df.empty or 'latency_ms' not in df.columns:
-            bad.append(p); continue
-        rows.append(per_run(df, path.stem))
+    # Only files whose size or mtime changed since the cached summary are read again
+    cache_path = Path(args.cache)
+    cache = {} if args.no_cache else load_cache(cache_path)
+    rows, bad, todo, keys = [], [], [], {}
+    for rid, p in files:
+        key = _stat_key(p)
+        hit = cache.get(p)
+        if key is not None and hit is not None and hit[:2] == key and hit[2]['run_id'] == rid:
+            rows.append(hit[2])
+        else:
+            keys[p] = key
+            todo.append((rid, p, args.from_sketches))
+    if todo:
+        workers = max(1, min(args.workers, len(todo)))
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            results = ex.map(summarize, todo, chunksize=max(1, len(todo) // (4 * workers)))
+            for (rid, p, _), row in zip(todo, results):
+                if row is None:
+                    bad.append(p); continue
+                rows.append(row)
+                if keys[p] is not None:
+                    cache[p] = (*keys[p], row)
+    print(f"Summarised {len(todo)} new/changed run(s), {len(files) - len(todo)} from {cache_path}")
+    if not args.no_cache and todo:
+        save_cache(cache_path, cache)
 
     if not rows:
-        pd.DataFrame(columns=['run_id','p50','p95','p99','throughput_ops_s','staleness_ms_mean','conflict_rate']).to_csv(args.out, index=False)
-        print("No good parquet files found; wrote empty summary to", args.out)
+        pd.DataFrame(columns=SUMMARY_COLS).to_csv(args.out, index=False)
+        print("No good input files found; wrote empty summary to", args.out)
         return
 
     out = pd.DataFrame(rows).sort_values('run_id')
     out.to_csv(args.out, index=False)
     print("Wrote", args.out, "with", len(out), "rows.")
 
-    # Enrich with manifests
+    # Enrich with run configs: one read of the run index, per-run manifests for runs it lacks
     def load_cfg(rid):
         mp = Path(f'results/agg/{rid}.manifest.json')
         if mp.exists():
             try:
-                return pd.json_normalize([__import__('json').loads(mp.read_text()).get('cfg', {})])
+                m = json.loads(mp.read_text())
+                c = pd.json_normalize([m.get('cfg', {})])
+                rt = m.get('router_stats') or {}
+                c['wire_bytes'] = rt.get('wire_bytes', 0)
+                c['messages'] = rt.get('messages', 0)
+                c['batch_mean'] = rt.get('batched_updates', 0) / max(1, rt.get('batches', 0))
+                return c
             except Exception:
                 pass
         return pd.json_normalize([{}])
 
     cfgs = []
+    indexed = set()
+    if index is not None:
+        ic = pd.json_normalize([json.loads(j) for j in index['cfg']])
+        ic['run_id'] = index['run_id'].values
+        for col in ('wire_bytes', 'messages', 'batch_mean'):
+            ic[col] = index[col].values
+        cfgs.append(ic)
+        indexed = set(index['run_id'])
     for rid in out['run_id']:
-        c = load_cfg(rid); c['run_id'] = rid; cfgs.append(c)
+        if rid not in indexed:
+            c = load_cfg(rid); c['run_id'] = rid; cfgs.append(c)
     cfgdf = pd.concat(cfgs, ignore_index=True)
     joined = out.merge(cfgdf, on='run_id', how='left')
     joined['strategy'] = joined.get('mcp.strategy', 'NA')
@@ -80,6 +239,8 @@ def main():
     joined['context_tokens'] = joined.get('context.size_tokens', None)
     joined['workload'] = joined.get('workload.type', None)
     joined['access_pattern'] = joined.get('access_pattern.type', None)
+    for col in ('wire_bytes', 'messages', 'batch_mean'):
+        joined[col] = joined.get(col, 0)
 
     joined.to_csv('tables/summary_enriched.csv', index=False)
 
@@ -90,7 +251,10 @@ def main():
         p95_std=('p95','std'),
         thr_mean=('throughput_ops_s','mean'),
         thr_std=('throughput_ops_s','std'),
-        stale_mean=('staleness_ms_mean','mean')
+        stale_mean=('staleness_ms_mean','mean'),
+        wire_bytes_mean=('wire_bytes','mean'),
+        messages_mean=('messages','mean'),
+        batch_mean=('batch_mean','mean')
     ).reset_index()
     strat.to_csv('tables/per_strategy.csv', index=False)
 
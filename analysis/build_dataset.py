@@ -1,17 +1,59 @@
 # analysis/build_dataset.py
 import glob, json, os, sys, tempfile, shutil
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import numpy as np
 import pyarrow as pa
+import pyarrow.compute as pc
 import pyarrow.parquet as pq
 
 RAW_GLOB = "results/raw/*.parquet"
 MAN_TPL   = "results/agg/{rid}.manifest.json"
+INDEX     = "results/dataset/runs.parquet"  # run index (mcpbench.dataset); manifests are the fallback
 OUT_PARQ  = "tables/runs_merged.parquet"
 OUT_CSV   = "tables/runs_merged.csv"   # optional, sampled
 CSV_SAMPLE = 0                         # set >0 to sample that many rows per run into CSV
+READ_THREADS = min(8, os.cpu_count() or 1)  # parquet decode releases the GIL; reads overlap the writer
+ROW_GROUP_ROWS = 1 << 20               # runs are written whole and in run_id order, so row groups never mix runs
+ZSTD_LEVEL = 6
+
+DATA_COLS = ["latency_ms", "staleness_ms", "conflict", "start", "end", "op"]
+_dict = lambda t: pa.dictionary(pa.int32(), t)
+# per-run constants are dictionary arrays: an all-zero index buffer plus a one-entry dictionary,
+# stored in parquet as a single dictionary page and RLE-encoded indices per row group
+SCHEMA = pa.schema([
+    ("run_id", _dict(pa.string())),
+    ("latency_ms", pa.float64()),
+    ("staleness_ms", pa.float64()),
+    ("conflict", pa.bool_()),
+    ("start", pa.float64()),
+    ("end", pa.float64()),
+    ("op", _dict(pa.string())),
+    ("strategy", _dict(pa.string())),
+    ("agents", _dict(pa.int64())),
+    ("context_tokens", _dict(pa.int64())),
+    ("workload", _dict(pa.string())),
+    ("read_ratio", _dict(pa.float64())),
+    ("ops_per_sec_cfg", _dict(pa.int64())),
+    ("access_pattern", _dict(pa.string())),
+])
+DICT_COLS = [f.name for f in SCHEMA if pa.types.is_dictionary(f.type)]
+FLOAT_COLS = ["latency_ms", "staleness_ms", "start", "end"]  # byte-split planes compress far better under zstd
+
+_index_cfgs = None
 
 def load_manifest_dict(rid: str) -> dict:
+    global _index_cfgs
+    if _index_cfgs is None:
+        cfgs = {}  # built before publishing: reader threads must never see a half-filled map
+        if Path(INDEX).exists():
+            t = pq.read_table(INDEX, columns=["run_id", "cfg"])
+            cfgs = dict(zip(t["run_id"].to_pylist(), t["cfg"].to_pylist()))
+        _index_cfgs = cfgs
+    if rid in _index_cfgs:
+        return json.loads(_index_cfgs[rid])
     p = Path(MAN_TPL.format(rid=rid))
     if not p.exists():
         return {}
@@ -28,33 +70,86 @@ def get(cfg: dict, path: str, default=None):
         cur = cur[k]
     return cur
 
-def to_str_array(val, length: int):
-    return pa.array([val] * length, type=pa.string())
+def const_array(val, length: int, dtype: pa.DataType) -> pa.Array:
+    """`val` repeated `length` times without materialising Python objects."""
+    if val is None:
+        return pa.nulls(length, type=dtype)
+    if pa.types.is_dictionary(dtype):
+        return pa.DictionaryArray.from_arrays(pa.array(np.zeros(length, dtype=np.int32)),
+                                              pa.array([val], type=dtype.value_type))
+    return pa.repeat(pa.scalar(val, type=dtype), length)
+
+def read_run(p: str):
+    """Read one raw parquet and return its merged-schema table (None when empty or unreadable)."""
+    rid = Path(p).stem
+    # read just needed columns (lower memory)
+    try:
+        names = set(pq.read_schema(p).names)
+        table = pq.read_table(p, columns=[c for c in DATA_COLS if c in names])
+    except Exception as e:
+        print(f"[WARN] skipping unreadable parquet: {p} ({e})", file=sys.stderr)
+        return None
+    n = table.num_rows
+    if n == 0:
+        return None
+
+    # within a run, rows are grouped by op kind then time, so `op` indices run-length encode too
+    keys = [(c, "ascending") for c in ("op", "start") if c in table.column_names]
+    if keys:
+        table = table.take(pc.sort_indices(table, sort_keys=keys))
+
+    cfg = load_manifest_dict(rid)
+    consts = {
+        "run_id": rid,
+        "strategy": get(cfg, "mcp/strategy", "NA"),
+        "agents": get(cfg, "agents/count", None),
+        "context_tokens": get(cfg, "context/size_tokens", None),
+        "workload": get(cfg, "workload/type", None),
+        "read_ratio": get(cfg, "workload/read_ratio", None),
+        "ops_per_sec_cfg": get(cfg, "workload/ops_per_sec", None),
+        "access_pattern": get(cfg, "access_pattern/type", None),
+    }
+    # Ensure required data columns exist (fill if missing)
+    defaults = {"conflict": False, "op": "NA"}
+
+    cols = []
+    for field in SCHEMA:
+        if field.name in consts:
+            cols.append(const_array(consts[field.name], n, field.type))
+        elif field.name in table.column_names:
+            cols.append(table[field.name].cast(field.type))
+        else:
+            cols.append(const_array(defaults.get(field.name), n, field.type))
+    return pa.Table.from_arrays(cols, schema=SCHEMA)
+
+def read_ahead(files, threads: int):
+    """Yield read_run(p) in `files` order while up to 2*threads later files are read in the background."""
+    with ThreadPoolExecutor(max_workers=max(1, threads)) as ex:
+        pending = deque()
+        it = iter(files)
+        for p in it:
+            pending.append(ex.submit(read_run, p))
+            if len(pending) >= 2 * max(1, threads):
+                break
+        while pending:
+            yield pending.popleft().result()
+            nxt = next(it, None)
+            if nxt is not None:
+                pending.append(ex.submit(read_run, nxt))
+
+def open_writer(path: str) -> pq.ParquetWriter:
+    return pq.ParquetWriter(path, SCHEMA, compression="zstd", compression_level=ZSTD_LEVEL,
+                            use_dictionary=DICT_COLS, use_byte_stream_split=FLOAT_COLS)
 
 def main():
     Path("tables").mkdir(exist_ok=True, parents=True)
 
+    # sorted by run_id: row groups are ordered by run, and their run_id statistics let readers skip runs
     files = sorted(glob.glob(RAW_GLOB))
     if not files:
         print(f"[WARN] No input files match {RAW_GLOB}")
         # still create empty parquet with schema so downstream scripts don’t crash
-        schema = pa.schema([
-            ("run_id", pa.string()),
-            ("latency_ms", pa.float64()),
-            ("staleness_ms", pa.float64()),
-            ("conflict", pa.bool_()),
-            ("start", pa.float64()),
-            ("end", pa.float64()),
-            ("op", pa.string()),
-            ("strategy", pa.string()),
-            ("agents", pa.int64()),
-            ("context_tokens", pa.int64()),
-            ("workload", pa.string()),
-            ("read_ratio", pa.float64()),
-            ("ops_per_sec_cfg", pa.int64()),
-            ("access_pattern", pa.string()),
-        ])
-        with pq.ParquetWriter(OUT_PARQ, schema) as w:
+        with open_writer(OUT_PARQ) as w:
             pass
         print("Wrote empty parquet:", OUT_PARQ)
         return
@@ -70,72 +165,13 @@ def main():
         csv_tmp = OUT_CSV + ".tmp"
 
     try:
-        for p in files:
-            rid = Path(p).stem
-            # read just needed columns (lower memory)
-            try:
-                table = pq.read_table(
-                    p,
-                    columns=["op_id", "latency_ms", "staleness_ms", "conflict", "start", "end", "op"],
-                )
-            except Exception as e:
-                print(f"[WARN] skipping unreadable parquet: {p} ({e})", file=sys.stderr)
+        for final_table in read_ahead(files, READ_THREADS):
+            if final_table is None:
                 continue
 
-            n = table.num_rows
-            if n == 0:
-                continue
-
-            cfg = load_manifest_dict(rid)
-
-            # Build extra columns as Arrow arrays
-            cols = {
-                "run_id": to_str_array(rid, n),
-                "strategy": to_str_array(get(cfg, "mcp/strategy", "NA"), n),
-                "agents": pa.array([get(cfg, "agents/count", None)] * n, type=pa.int64()),
-                "context_tokens": pa.array([get(cfg, "context/size_tokens", None)] * n, type=pa.int64()),
-                "workload": to_str_array(get(cfg, "workload/type", None), n),
-                "read_ratio": pa.array([get(cfg, "workload/read_ratio", None)] * n, type=pa.float64()),
-                "ops_per_sec_cfg": pa.array([get(cfg, "workload/ops_per_sec", None)] * n, type=pa.int64()),
-                "access_pattern": to_str_array(get(cfg, "access_pattern/type", None), n),
-            }
-
-            # Ensure required data columns exist (fill with nulls if missing)
-            def ensure(tab, name, pa_type, default=None):
-                if name in tab.column_names:
-                    return tab[name]
-                return pa.chunked_array([pa.array([default] * n, type=pa_type)])
-
-            base_cols = {
-                "latency_ms": ensure(table, "latency_ms", pa.float64(), None),
-                "staleness_ms": ensure(table, "staleness_ms", pa.float64(), None),
-                "conflict": ensure(table, "conflict", pa.bool_(), False),
-                "start": ensure(table, "start", pa.float64(), None),
-                "end": ensure(table, "end", pa.float64(), None),
-                "op": ensure(table, "op", pa.string(), "NA"),
-            }
-
-            # Construct final table (order is stable)
-            final_table = pa.table({
-                "run_id": cols["run_id"],
-                "latency_ms": base_cols["latency_ms"],
-                "staleness_ms": base_cols["staleness_ms"],
-                "conflict": base_cols["conflict"],
-                "start": base_cols["start"],
-                "end": base_cols["end"],
-                "op": base_cols["op"],
-                "strategy": cols["strategy"],
-                "agents": cols["agents"],
-                "context_tokens": cols["context_tokens"],
-                "workload": cols["workload"],
-                "read_ratio": cols["read_ratio"],
-                "ops_per_sec_cfg": cols["ops_per_sec_cfg"],
-                "access_pattern": cols["access_pattern"],
-            })
-
             if writer is None:
-                writer = pq.ParquetWriter(tmp_parq, final_table.schema)
-            writer.write_table(final_table)
+                writer = open_writer(tmp_parq)
+            writer.write_table(final_table, row_group_size=ROW_GROUP_ROWS)
 
             # Optional: write a sampled CSV row-chunk (for quick looks)
             if CSV_SAMPLE and CSV_SAMPLE > 0:
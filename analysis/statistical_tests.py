@@ -1,41 +1,109 @@
 # analysis/statistical_tests.py
-import pandas as pd, itertools
+import argparse, itertools, json, os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
 from scipy import stats
 from pathlib import Path
-import json
-
-summ = pd.read_csv('tables/summary_enriched.csv') if Path('tables/summary_enriched.csv').exists() else pd.read_csv('tables/summary.csv')
-if 'strategy' not in summ.columns:
-    rows = []
-    for rid in summ['run_id']:
-        mp = Path(f'results/agg/{rid}.manifest.json')
-        row = {'run_id': rid, 'strategy': 'NA'}
-        if mp.exists():
-            try:
-                j = json.loads(mp.read_text()).get('cfg', {})
-                row['strategy'] = j.get('mcp',{}).get('strategy','NA')
-            except Exception:
-                pass
-        rows.append(row)
-    summ = summ.merge(pd.DataFrame(rows), on='run_id', how='left')
-
-groups = [g['p95'].values for _, g in summ.groupby('strategy') if len(g) > 1]
-labels = [k for k, g in summ.groupby('strategy') if len(g) > 1]
-
-if len(groups) >= 2:
-    f, p = stats.f_oneway(*groups)
-    print("ANOVA p95 across strategies: F=%.4f p=%.4g" % (f, p))
-else:
-    print("ANOVA skipped (not enough groups).")
-
-pairs = list(itertools.combinations(labels, 2))
-m = len(pairs)
-rows = []
-for a, b in pairs:
-    xa = summ[summ['strategy']==a]['p95'].values
-    xb = summ[summ['strategy']==b]['p95'].values
-    if len(xa) > 1 and len(xb) > 1:
-        t, p = stats.ttest_ind(xa, xb, equal_var=False)
-        rows.append({'A':a,'B':b,'t':float(t),'p_raw':float(p),'p_bonf':float(min(1.0, p*m))})
-pd.DataFrame(rows).to_csv('tables/pairwise_p95_bonferroni.csv', index=False)
-print("Wrote tables/pairwise_p95_bonferroni.csv")
+from mcpbench.utils import pairwise_welch
+
+CELL = ['agents', 'workload']  # strategies are compared within each cell of the factorial grid
+METRICS = ['p50', 'p95', 'p99', 'throughput_ops_s']
+
+def holm(p) -> np.ndarray:
+    """Holm step-down adjusted p-values for one family of tests."""
+    p = np.asarray(p, dtype=float)
+    order = np.argsort(p)
+    adj = np.maximum.accumulate(p[order] * (p.size - np.arange(p.size)))
+    out = np.empty_like(p)
+    out[order] = np.minimum(1.0, adj)
+    return out
+
+def analyze_cell(task):
+    """Worker: bootstrap CIs of the per-run mean of each metric per strategy, and pairwise
+    Mann-Whitney U tests between strategies, for one agents x workload cell."""
+    key, df, n_boot = task
+    from mcpbench.utils import bootstrap_cis
+    cis, tests = [], []
+    groups = {s: g[METRICS].to_numpy(dtype=float) for s, g in df.groupby('strategy')}
+    for strat, x in groups.items():
+        lo, hi = bootstrap_cis(x, n_boot)
+        mean = x.mean(axis=0)
+        cis += [{**key, 'strategy': strat, 'metric': m, 'runs': len(x), 'mean': mean[i],
+                 'ci_lo': lo[i], 'ci_hi': hi[i]} for i, m in enumerate(METRICS)]
+    for a, b in itertools.combinations(sorted(groups), 2):
+        xa, xb = groups[a], groups[b]
+        if len(xa) < 2 or len(xb) < 2:
+            continue
+        u, p = stats.mannwhitneyu(xa, xb, alternative='two-sided', axis=0)
+        tests += [{**key, 'metric': m, 'A': a, 'B': b, 'n_A': len(xa), 'n_B': len(xb),
+                   'median_A': float(np.median(xa[:, i])), 'median_B': float(np.median(xb[:, i])),
+                   'U': float(u[i]), 'p_raw': float(p[i])} for i, m in enumerate(METRICS)]
+    return cis, tests
+
+def cell_statistics(summ: pd.DataFrame, n_boot: int = 2000, workers: int = 1):
+    """Bootstrap CIs per strategy x cell and Mann-Whitney tests between strategies within each cell,
+    cells spread over `workers` processes; p_holm adjusts each metric's tests over the whole grid."""
+    df = summ.copy()
+    for c in CELL:
+        df[c] = df[c].fillna('NA') if c in df.columns else 'NA'
+    tasks = [(dict(zip(CELL, k)), g[['strategy'] + METRICS], n_boot) for k, g in df.groupby(CELL)]
+    workers = max(1, min(workers, len(tasks)))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            results = list(ex.map(analyze_cell, tasks, chunksize=max(1, len(tasks) // (4 * workers))))
+    else:
+        results = [analyze_cell(t) for t in tasks]
+    cis = pd.DataFrame([r for c, _ in results for r in c],
+                       columns=CELL + ['strategy', 'metric', 'runs', 'mean', 'ci_lo', 'ci_hi'])
+    tests = pd.DataFrame([r for _, t in results for r in t],
+                         columns=CELL + ['metric', 'A', 'B', 'n_A', 'n_B', 'median_A', 'median_B', 'U', 'p_raw'])
+    tests['p_holm'] = tests.groupby('metric')['p_raw'].transform(holm) if len(tests) else []
+    return cis, tests
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--n-boot', type=int, default=2000, help='Bootstrap resamples per cell')
+    ap.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Processes analysing cells')
+    args = ap.parse_args()
+
+    summ = pd.read_csv('tables/summary_enriched.csv') if Path('tables/summary_enriched.csv').exists() else pd.read_csv('tables/summary.csv')
+    index = Path('results/dataset/runs.parquet')
+    if 'strategy' not in summ.columns and index.exists():
+        import pyarrow.parquet as pq
+        strat = pq.read_table(index, columns=['run_id','strategy']).to_pandas()
+        summ = summ.merge(strat.astype({'strategy': str}), on='run_id', how='left')
+        summ['strategy'] = summ['strategy'].fillna('NA')
+    elif 'strategy' not in summ.columns:
+        rows = []
+        for rid in summ['run_id']:
+            mp = Path(f'results/agg/{rid}.manifest.json')
+            row = {'run_id': rid, 'strategy': 'NA'}
+            if mp.exists():
+                try:
+                    j = json.loads(mp.read_text()).get('cfg', {})
+                    row['strategy'] = j.get('mcp',{}).get('strategy','NA')
+                except Exception:
+                    pass
+            rows.append(row)
+        summ = summ.merge(pd.DataFrame(rows), on='run_id', how='left')
+
+    groups = [g['p95'].values for _, g in summ.groupby('strategy') if len(g) > 1]
+
+    if len(groups) >= 2:
+        f, p = stats.f_oneway(*groups)
+        print("ANOVA p95 across strategies: F=%.4f p=%.4g" % (f, p))
+    else:
+        print("ANOVA skipped (not enough groups).")
+
+    pairwise_welch(summ, 'p95', 'strategy').drop(columns=['mean_A','mean_B']).to_csv('tables/pairwise_p95_bonferroni.csv', index=False)
+    print("Wrote tables/pairwise_p95_bonferroni.csv")
+
+    cis, tests = cell_statistics(summ, args.n_boot, args.workers)
+    cis.to_csv('tables/bootstrap_ci.csv', index=False)
+    tests.to_csv('tables/pairwise_mannwhitney_holm.csv', index=False)
+    print(f"Wrote tables/bootstrap_ci.csv ({len(cis)} rows) and tables/pairwise_mannwhitney_holm.csv "
+          f"({len(tests)} tests, {int((tests['p_holm'] < 0.05).sum()) if len(tests) else 0} significant at 0.05 after Holm)")
+
+if __name__ == '__main__':
+    main()
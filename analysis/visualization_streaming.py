@@ -6,7 +6,7 @@ os.environ.setdefault("OPENBLAS_NUM_THREADS", "1")
 os.environ.setdefault("MKL_NUM_THREADS", "1")
 os.environ.setdefault("NUMEXPR_NUM_THREADS", "1")
 
-import glob, json, random, sys
+import argparse, glob, json, sys
 from pathlib import Path
 import numpy as np
 import matplotlib.pyplot as plt
@@ -17,15 +17,24 @@ FIGDIR.mkdir(parents=True, exist_ok=True)
 
 # ---------- TUNABLES ----------
 RAW_GLOB = "results/raw/*.parquet"
-MAX_FILES = 80          # sample at most this many runs
-SAMPLE_PER_FILE = 5000  # sample this many rows per selected run
-MAX_PER_STRAT = 150000  # cap rows per strategy globally (prevents runaway memory)
+SKETCH_GLOB = "results/agg/*.sketch.json"  # preferred: run-time histograms, no raw rows read
+INDEX = Path("results/dataset/runs.parquet")  # run index (mcpbench.dataset): strategy without manifests
+MAX_PER_STRAT = 150000  # reservoir size per strategy: a uniform sample over all of its runs' rows
+BATCH_ROWS = 65536      # rows decoded per step while streaming a file
 RNG_SEED = 42
 # ------------------------------
 
-random.seed(RNG_SEED)
+_index_strats = None
 
 def strategy_from_manifest(run_id: str):
+    global _index_strats
+    if _index_strats is None:
+        _index_strats = {}
+        if INDEX.exists():
+            t = pq.read_table(INDEX, columns=["run_id", "strategy"])
+            _index_strats = dict(zip(t["run_id"].to_pylist(), t["strategy"].to_pylist()))
+    if run_id in _index_strats:
+        return _index_strats[run_id]
     mp = Path(f"results/agg/{run_id}.manifest.json")
     if not mp.exists():
         return "NA"
@@ -40,59 +49,125 @@ def savefig(name):
     plt.savefig(FIGDIR / f"{name}.png", dpi=180)
     plt.close()
 
+def plot_from_sketches(paths):
+    from mcpbench.sketch import LogHistogram
+    merged = {"latency_ms": {}, "staleness_ms": {}}
+    for p in paths:
+        try:
+            sk = json.loads(Path(p).read_text())
+        except Exception as e:
+            print(f"[WARN] skip {p}: {e}", file=sys.stderr)
+            continue
+        strat = sk.get("strategy", "NA")
+        for metric, bucket in merged.items():
+            for d in sk["hist"][metric].values():
+                h = LogHistogram.from_dict(d)
+                if strat in bucket:
+                    bucket[strat].merge(h)
+                else:
+                    bucket[strat] = h
+
+    stats = []
+    for strat, h in sorted(merged["staleness_ms"].items()):
+        if not h.total: continue
+        q1, med, q3 = h.quantile(0.25), h.quantile(0.5), h.quantile(0.75)
+        iqr = q3 - q1
+        stats.append({"label": strat, "q1": q1, "med": med, "q3": q3,
+                      "whislo": max(h.min, q1 - 1.5*iqr), "whishi": min(h.max, q3 + 1.5*iqr)})
+    if stats:
+        plt.figure()
+        plt.gca().bxp(stats, showfliers=False)
+        plt.ylabel("Staleness (ms)"); plt.title("Staleness by Strategy (all runs, histogram)")
+        savefig("05_staleness_boxplot_by_strategy_sampled")
+        print("Saved 05_staleness_boxplot_by_strategy_sampled.png")
+
+    if any(h.total for h in merged["latency_ms"].values()):
+        plt.figure()
+        for strat, h in sorted(merged["latency_ms"].items()):
+            if not h.total: continue
+            x, y = h.cdf()
+            plt.step(x, y, where="post", label=strat)
+        plt.xlabel("Latency (ms)"); plt.ylabel("CDF")
+        plt.title("Latency CDF by Strategy (all runs, histogram)")
+        plt.legend()
+        savefig("06_latency_cdf_by_strategy_sampled")
+        print("Saved 06_latency_cdf_by_strategy_sampled.png")
+
+ap = argparse.ArgumentParser(description="Staleness boxplot and latency CDF by strategy")
+ap.add_argument("--raw", action="store_true",
+                help="Sample the raw parquet rows (exact values) even when run-time sketches exist")
+args = ap.parse_args()
+
+sketches = [] if args.raw else sorted(glob.glob(SKETCH_GLOB))
+if sketches:
+    have = {Path(p).name[:-len(".sketch.json")] for p in sketches}
+    missing = [Path(p).stem for p in glob.glob(RAW_GLOB) if Path(p).stem not in have]
+    if missing:
+        print(f"[WARN] {len(missing)} raw run(s) have no sketch and are left out; use --raw to include them",
+              file=sys.stderr)
+    plot_from_sketches(sketches)
+    print("Done (sketches).")
+    sys.exit(0)
+
+class Reservoir:
+    """Uniform sample of up to `cap` rows from a stream of column batches (Algorithm R, vectorised per batch).
+
+    Rows live in one preallocated (cap, ncols) buffer; row i (0-based) of the stream is kept with probability
+    cap/(i+1) and overwrites a uniformly chosen slot, so memory is fixed however many runs are streamed."""
+    def __init__(self, cap: int, ncols: int, rng: np.random.Generator):
+        self.buf = np.empty((cap, ncols), dtype=float)
+        self.seen = 0
+        self.rng = rng
+
+    def add(self, rows: np.ndarray):
+        cap, m = len(self.buf), len(rows)
+        fill = min(m, max(0, cap - self.seen))
+        self.buf[self.seen:self.seen + fill] = rows[:fill]
+        if fill < m:
+            pos = np.arange(self.seen + fill, self.seen + m)
+            slot = self.rng.integers(0, pos + 1)
+            hit = np.flatnonzero(slot < cap) + fill
+            if hit.size:
+                # several rows of one batch may land on a slot; the latest wins, as in the sequential algorithm
+                slots = slot[hit - fill][::-1]
+                _, last = np.unique(slots, return_index=True)
+                self.buf[slots[last]] = rows[hit[::-1][last]]
+        self.seen += m
+
+    def sample(self) -> np.ndarray:
+        return self.buf[:min(self.seen, len(self.buf))]
+
 files = sorted(glob.glob(RAW_GLOB))
 if not files:
     print(f"[WARN] No files match {RAW_GLOB}", file=sys.stderr)
     sys.exit(0)
 
-# Downselect files to keep memory bounded
-if len(files) > MAX_FILES:
-    random.shuffle(files)
-    files = files[:MAX_FILES]
-
-# Reservoir-like bounded collectors
-lat_by_strat = {}
-stale_by_strat = {}
-
-def bounded_extend(bucket: dict, key: str, arr: np.ndarray, cap: int):
-    if key not in bucket:
-        bucket[key] = np.empty((0,), dtype=float)
-    remaining = cap - bucket[key].size
-    if remaining <= 0: 
-        return
-    if arr.size > remaining:
-        arr = arr[:remaining]
-    bucket[key] = np.concatenate([bucket[key], arr])
+# One pass over every run: each row batch carries both columns into its strategy's reservoir.
+# A single generator across files keeps runs from sharing the same sampled positions.
+COLS = ["latency_ms", "staleness_ms"]
+rng = np.random.default_rng(RNG_SEED)
+reservoirs = {}
 
 for p in files:
-    run_id = Path(p).stem
-    strat = strategy_from_manifest(run_id)
-
+    strat = strategy_from_manifest(Path(p).stem)
     try:
-        t_lat = pq.read_table(p, columns=["latency_ms"])
+        pf = pq.ParquetFile(p)
+        present = [c for c in COLS if c in pf.schema_arrow.names]
+        if "latency_ms" not in present:
+            continue
+        res = reservoirs.setdefault(strat, Reservoir(MAX_PER_STRAT, len(COLS), rng))
+        for batch in pf.iter_batches(batch_size=BATCH_ROWS, columns=present):
+            rows = np.full((batch.num_rows, len(COLS)), np.nan)
+            for i, c in enumerate(COLS):
+                if c in present:
+                    rows[:, i] = batch.column(c).to_numpy(zero_copy_only=False)
+            res.add(rows)
     except Exception as e:
         print(f"[WARN] skip {p}: {e}", file=sys.stderr)
         continue
 
-    n = t_lat.num_rows
-    if n == 0: 
-        continue
-
-    # draw random indices (without reading full columns into pandas)
-    k = min(SAMPLE_PER_FILE, n)
-    idx = np.sort(np.random.default_rng(RNG_SEED).choice(n, size=k, replace=False))
-
-    lat_chunk = t_lat.column("latency_ms").to_numpy()[idx]
-    bounded_extend(lat_by_strat, strat, lat_chunk.astype(float), MAX_PER_STRAT)
-
-    # staleness (optional, only if exists)
-    try:
-        t_stale = pq.read_table(p, columns=["staleness_ms"])
-        stale_col = t_stale.column("staleness_ms").to_numpy()
-        if stale_col is not None and len(stale_col) == n:
-            bounded_extend(stale_by_strat, strat, stale_col[idx].astype(float), MAX_PER_STRAT)
-    except Exception:
-        pass
+lat_by_strat = {s: r.sample()[:, 0] for s, r in reservoirs.items()}
+stale_by_strat = {s: v[~np.isnan(v)] for s, v in ((s, r.sample()[:, 1]) for s, r in reservoirs.items())}
 
 # ---- Figure 05: Staleness boxplot (sampled) ----
 if any(v.size > 0 for v in stale_by_strat.values()):
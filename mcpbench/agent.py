@@ -1,4 +1,3 @@
-import time
 from dataclasses import dataclass
 from typing import Optional
 from .metrics import Metrics
@@ -12,25 +11,58 @@ class OpResult:
     end: float
     success: bool
     staleness_ms: float = 0.0
+    versions_behind: int = 0
     conflict: bool = False
     version_seen: int = 0
+    intended_start: float = 0.0
+    retries: int = 0
 
 class Agent:
-    def __init__(self, agent_id: int, strategy, metrics: Metrics):
+    def __init__(self, agent_id: int, strategy, metrics: Metrics, clock=None):
         self.id = agent_id
         self.strategy = strategy
+        self.clock = clock or strategy.clock
         self.metrics = metrics
         self._op_id = 0
 
-    def step(self, op: str, cid: str, payload: Optional[str]=None):
+    def _record_read(self, op_id, cid, item, start, end, intended):
+        if item is None:
+            self.metrics.record(op_id, 'read', cid, start, end, False, 0.0, False, 0, intended)
+            return
+        self.strategy.note_read(cid, item.version)
+        behind, stale_ms = self.strategy.staleness(cid, item)
+        self.metrics.record(op_id, 'read', cid, start, end, True, stale_ms, False, item.version, intended, 0, behind)
+
+    def step(self, op: str, cid: str, payload: Optional[str]=None, intended: Optional[float]=None):
         self._op_id += 1
-        start = time.time()
+        start = self.clock.time()
+        if intended is None:
+            intended = start
         if op == 'read':
-            item, stale_ms = self.strategy.read(cid)
-            ok = item is not None
-            end = time.time()
-            self.metrics.record_op(OpResult(self._op_id, op, cid, start, end, ok, stale_ms, False, item.version if item else 0))
+            item = self.strategy.read(cid)
+            end = self.clock.time()
+            self._record_read(self._op_id, cid, item, start, end, intended)
         else:
             ok = self.strategy.write(cid, payload)
-            end = time.time()
-            self.metrics.record_op(OpResult(self._op_id, op, cid, start, end, ok, 0.0, False, 0))
+            end = self.clock.time()
+            st = self.strategy
+            self.metrics.record(self._op_id, op, cid, start, end, ok, 0.0, st.last_conflict, st.seen.get(cid, 0), intended,
+                                st.last_retries)
+
+    async def astep(self, op: str, cid: str, payload: Optional[str]=None, intended: Optional[float]=None):
+        self._op_id += 1
+        op_id = self._op_id
+        start = self.clock.time()
+        if intended is None:
+            intended = start
+        if op == 'read':
+            item = await self.strategy.aread(cid)
+            end = self.clock.time()
+            self._record_read(op_id, cid, item, start, end, intended)
+        else:
+            # this op's own outcome: another op of this agent may have written since the await
+            item, conflict, retries = await self.strategy.awrite(cid, payload)
+            end = self.clock.time()
+            version = item.version if item is not None else self.strategy.seen.get(cid, 0)
+            self.metrics.record(op_id, op, cid, start, end, item is not None, 0.0, conflict, version, intended,
+                                retries)
@@ -0,0 +1,281 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+class CachePolicy(ABC):
+    """Weighted-capacity cache; weigher(value) gives each entry's cost (default 1 = entry count)."""
+    def __init__(self, capacity: int, weigher=None):
+        self.capacity = capacity
+        self.weigher = weigher or (lambda v: 1)
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @abstractmethod
+    def get(self, key):
+        ...
+
+    @abstractmethod
+    def put(self, key, value):
+        ...
+
+    @abstractmethod
+    def pop(self, key, default=None):
+        ...
+
+    @abstractmethod
+    def items(self) -> list:
+        """Resident (key, value) pairs, least valuable first."""
+        ...
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'entries': len(self), 'weight': self.weight, 'capacity': self.capacity}
+
+class LRUCache(CachePolicy):
+    def __init__(self, capacity: int, weigher=None):
+        super().__init__(capacity, weigher)
+        self._d = OrderedDict()  # key -> (value, weight), LRU first
+
+    def __len__(self):
+        return len(self._d)
+
+    def __contains__(self, key):
+        return key in self._d
+
+    def get(self, key):
+        e = self._d.get(key)
+        if e is None:
+            self.misses += 1
+            return None
+        self._d.move_to_end(key)
+        self.hits += 1
+        return e[0]
+
+    def put(self, key, value):
+        self.pop(key)
+        w = self.weigher(value)
+        if w > self.capacity:
+            return
+        self._d[key] = (value, w)
+        self.weight += w
+        while self.weight > self.capacity:
+            _, (_, ow) = self._d.popitem(last=False)
+            self.weight -= ow
+            self.evictions += 1
+
+    def pop(self, key, default=None):
+        e = self._d.pop(key, None)
+        if e is None:
+            return default
+        self.weight -= e[1]
+        return e[0]
+
+    def items(self):
+        return [(k, e[0]) for k, e in self._d.items()]
+
+class ARCCache(CachePolicy):
+    """Adaptive Replacement Cache (Megiddo & Modha) with weights in place of entry counts."""
+    def __init__(self, capacity: int, weigher=None):
+        super().__init__(capacity, weigher)
+        self.p = 0.0
+        self.t1, self.t2 = OrderedDict(), OrderedDict()  # resident: key -> (value, weight)
+        self.b1, self.b2 = OrderedDict(), OrderedDict()  # ghosts: key -> weight
+        self._t1w = self._b1w = self._b2w = 0
+
+    def __len__(self):
+        return len(self.t1) + len(self.t2)
+
+    def __contains__(self, key):
+        return key in self.t1 or key in self.t2
+
+    def get(self, key):
+        e = self.t1.pop(key, None)
+        if e is not None:
+            self._t1w -= e[1]
+            self.t2[key] = e
+        elif key in self.t2:
+            e = self.t2[key]
+            self.t2.move_to_end(key)
+        else:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return e[0]
+
+    def _replace(self, in_b2: bool):
+        if self.t1 and (self._t1w > self.p or (in_b2 and self._t1w == self.p) or not self.t2):
+            k, (_, w) = self.t1.popitem(last=False)
+            self._t1w -= w
+            self.b1[k] = w; self._b1w += w
+        else:
+            k, (_, w) = self.t2.popitem(last=False)
+            self.b2[k] = w; self._b2w += w
+        self.weight -= w
+        self.evictions += 1
+
+    def put(self, key, value):
+        self.pop(key)
+        w = self.weigher(value)
+        if w > self.capacity:
+            return
+        c = self.capacity
+        if key in self.b1:
+            self.p = min(c, self.p + max(self._b2w / max(1, self._b1w), 1) * w)
+            self._b1w -= self.b1.pop(key)
+            target, in_b2 = self.t2, False
+        elif key in self.b2:
+            self.p = max(0.0, self.p - max(self._b1w / max(1, self._b2w), 1) * w)
+            self._b2w -= self.b2.pop(key)
+            target, in_b2 = self.t2, True
+        else:
+            target, in_b2 = self.t1, False
+        while self.weight + w > c:
+            self._replace(in_b2)
+        target[key] = (value, w)
+        self.weight += w
+        if target is self.t1:
+            self._t1w += w
+        while self.b1 and self._t1w + self._b1w > c:
+            self._b1w -= self.b1.popitem(last=False)[1]
+        while self.b2 and self.weight + self._b1w + self._b2w > 2 * c:
+            self._b2w -= self.b2.popitem(last=False)[1]
+
+    def pop(self, key, default=None):
+        e = self.t1.pop(key, None)
+        if e is not None:
+            self._t1w -= e[1]
+        else:
+            e = self.t2.pop(key, None)
+        if e is None:
+            return default
+        self.weight -= e[1]
+        return e[0]
+
+    def items(self):
+        return [(k, e[0]) for seg in (self.t1, self.t2) for k, e in seg.items()]
+
+class _FrequencySketch:
+    """4-row count-min sketch with periodic halving (TinyLFU aging)."""
+    def __init__(self, width: int = 4096, depth: int = 4):
+        self.width = width
+        self.rows = [[0] * width for _ in range(depth)]
+        self.seeds = [0x9E3779B1 * (i + 1) for i in range(depth)]
+        self.additions = 0
+        self.sample_size = 10 * width
+
+    def increment(self, key):
+        for row, s in zip(self.rows, self.seeds):
+            i = hash((key, s)) % self.width
+            if row[i] < 15:
+                row[i] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self.additions //= 2
+            for row in self.rows:
+                row[:] = [c >> 1 for c in row]
+
+    def frequency(self, key) -> int:
+        return min(row[hash((key, s)) % self.width] for row, s in zip(self.rows, self.seeds))
+
+class WTinyLFUCache(CachePolicy):
+    """W-TinyLFU: 1% LRU admission window, TinyLFU filter, 20/80 segmented-LRU main space."""
+    def __init__(self, capacity: int, weigher=None, window_fraction: float = 0.01, protected_fraction: float = 0.8):
+        super().__init__(capacity, weigher)
+        self.window_cap = max(1, int(capacity * window_fraction))
+        self.main_cap = max(1, capacity - self.window_cap)
+        self.protected_cap = int(self.main_cap * protected_fraction)
+        self.window, self.probation, self.protected = OrderedDict(), OrderedDict(), OrderedDict()
+        self._ww = self._prw = self._pw = 0  # window / probation / protected weights
+        self.sketch = _FrequencySketch(width=min(1 << 16, max(4096, 1 << (4 * capacity - 1).bit_length())))
+
+    def __len__(self):
+        return len(self.window) + len(self.probation) + len(self.protected)
+
+    def __contains__(self, key):
+        return key in self.window or key in self.probation or key in self.protected
+
+    def get(self, key):
+        self.sketch.increment(key)
+        if key in self.window:
+            self.window.move_to_end(key)
+            e = self.window[key]
+        elif key in self.protected:
+            self.protected.move_to_end(key)
+            e = self.protected[key]
+        elif key in self.probation:
+            e = self.probation.pop(key)
+            self._prw -= e[1]
+            self.protected[key] = e
+            self._pw += e[1]
+            while self._pw > self.protected_cap and len(self.protected) > 1:
+                k, d = self.protected.popitem(last=False)
+                self._pw -= d[1]
+                self.probation[k] = d
+                self._prw += d[1]
+        else:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return e[0]
+
+    def _evict_main(self):
+        seg = self.probation if self.probation else self.protected
+        _, (_, w) = seg.popitem(last=False)
+        if seg is self.probation:
+            self._prw -= w
+        else:
+            self._pw -= w
+        self.weight -= w
+        self.evictions += 1
+
+    def put(self, key, value):
+        self.pop(key)
+        w = self.weigher(value)
+        if w > max(self.window_cap, self.main_cap):
+            return  # would leave the window at once and could never be admitted to main
+        self.window[key] = (value, w)
+        self._ww += w
+        self.weight += w
+        while self._ww > self.window_cap and self.window:
+            ck, (cv, cw) = self.window.popitem(last=False)
+            self._ww -= cw
+            if cw > self.main_cap:
+                self.weight -= cw  # can never fit main; reject before evicting anything for it
+                self.evictions += 1
+                continue
+            if self._prw + self._pw + cw > self.main_cap:
+                victims = self.probation or self.protected
+                if not victims or self.sketch.frequency(ck) <= self.sketch.frequency(next(iter(victims))):
+                    self.weight -= cw  # candidate loses admission
+                    self.evictions += 1
+                    continue
+                while self._prw + self._pw + cw > self.main_cap and (self.probation or self.protected):
+                    self._evict_main()
+            self.probation[ck] = (cv, cw)
+            self._prw += cw
+
+    def pop(self, key, default=None):
+        for seg in (self.window, self.probation, self.protected):
+            e = seg.pop(key, None)
+            if e is not None:
+                if seg is self.window:
+                    self._ww -= e[1]
+                elif seg is self.probation:
+                    self._prw -= e[1]
+                else:
+                    self._pw -= e[1]
+                self.weight -= e[1]
+                return e[0]
+        return default
+
+    def items(self):
+        return [(k, e[0]) for seg in (self.probation, self.window, self.protected) for k, e in seg.items()]
+
+POLICIES = {'lru': LRUCache, 'arc': ARCCache, 'wtinylfu': WTinyLFUCache}
+
+def make_cache(policy: str, capacity: int, weigher=None) -> CachePolicy:
+    try:
+        return POLICIES[policy.lower()](capacity, weigher)
+    except KeyError:
+        raise ValueError(f"unknown eviction policy: {policy}") from None
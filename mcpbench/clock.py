@@ -0,0 +1,55 @@
+import heapq, itertools, time
+
+class WallClock:
+    """Epoch-anchored clock that advances with the monotonic high-resolution counter."""
+    def __init__(self):
+        self._epoch = time.time()
+        self._base = time.perf_counter()
+
+    def time(self) -> float:
+        return self._epoch + (time.perf_counter() - self._base)
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds)
+
+class VirtualClock:
+    """Simulated time: sleeping advances the clock instead of blocking."""
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            self.now += seconds
+
+    def advance_to(self, t: float):
+        if t > self.now:
+            self.now = t
+
+class EventLoop:
+    """Discrete-event scheduler over a VirtualClock (events ordered by time, then FIFO)."""
+    def __init__(self, clock: VirtualClock):
+        self.clock = clock
+        self._q = []
+        self._seq = itertools.count()
+
+    def schedule(self, at: float, fn, *args):
+        heapq.heappush(self._q, (at, next(self._seq), fn, args))
+
+    def run_until(self, t_end: float, stop=None):
+        """Run events due before t_end, then advance to t_end; if `stop()` turns true after
+        an event, return at that event's time instead."""
+        while self._q and self._q[0][0] < t_end:
+            at, _, fn, args = heapq.heappop(self._q)
+            # an event due while an earlier op was still "sleeping" starts late, like a busy thread
+            self.clock.advance_to(at)
+            fn(*args)
+            if stop is not None and stop():
+                return
+        self.clock.advance_to(t_end)
+
+    def clear(self):
+        self._q.clear()
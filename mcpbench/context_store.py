@@ -1,25 +1,156 @@
+import sys, threading
 from dataclasses import dataclass
-from typing import Dict, Optional
-import time
+from typing import Dict, List, Optional, Tuple, Union
+import numpy as np
+from .clock import WallClock
 
-@dataclass
+Payload = Union[str, bytes, memoryview]  # memoryview: zero-copy slice of the payload corpus
+
+@dataclass(slots=True)
 class ContextItem:
     id: str
     version: int
-    data: str
+    data: Payload
     updated_at: float
 
+def _stripes(n: int) -> List[threading.Lock]:
+    return [threading.Lock() for _ in range(n)]
+
 class ContextStore:
-    def __init__(self):
+    def __init__(self, clock=None, lock_stripes: int = 64):
+        self.clock = clock or WallClock()
         self.store: Dict[str, ContextItem] = {}
+        self._locks = _stripes(lock_stripes)
+        self.payload_bytes = 0   # resident payload bytes (referenced, not copied)
+        self.bytes_written = 0
+
+    def cid(self, doc: int) -> str:
+        return f"doc:{doc}"
 
     def read(self, cid: str) -> Optional[ContextItem]:
         return self.store.get(cid)
 
-    def write(self, cid: str, data: str) -> ContextItem:
-        now = time.time()
+    def latest(self, cid: str) -> Tuple[int, float]:
+        """Authoritative (version, updated_at) of cid; (0, 0.0) if never written."""
         cur = self.store.get(cid)
+        return (cur.version, cur.updated_at) if cur else (0, 0.0)
+
+    def _put(self, cid: str, cur: Optional[ContextItem], data: Payload) -> ContextItem:
+        now = self.clock.time()
         v = (cur.version + 1) if cur else 1
+        n = len(data)
+        self.payload_bytes += n - (len(cur.data) if cur else 0)
+        self.bytes_written += n
         item = ContextItem(id=cid, version=v, data=data, updated_at=now)
         self.store[cid] = item
         return item
+
+    def write(self, cid: str, data: Payload) -> ContextItem:
+        with self._locks[hash(cid) % len(self._locks)]:
+            return self._put(cid, self.store.get(cid), data)
+
+    def write_if_version(self, cid: str, expected: int, data: Payload) -> Tuple[bool, Optional[ContextItem]]:
+        """Compare-and-swap on the version (0 = absent): (True, new item) or (False, current item)."""
+        with self._locks[hash(cid) % len(self._locks)]:
+            cur = self.store.get(cid)
+            if (cur.version if cur else 0) != expected:
+                return False, cur
+            return True, self._put(cid, cur, data)
+
+class ArrayContextStore:
+    """ContextStore facade over NumPy columns indexed by integer doc id.
+
+    Slot i holds doc i; other cids get slots past n_docs on first write. Per-doc state is the
+    version/updated_at/length columns plus a payload reference; cid() interns each doc's cid once,
+    and a read builds the ContextItem snapshot from the columns.
+    """
+    def __init__(self, n_docs: int, clock=None, prefix: str = 'doc:', lock_stripes: int = 64):
+        self.clock = clock or WallClock()
+        self._locks = _stripes(lock_stripes)
+        self.prefix = prefix
+        self._plen = len(prefix)
+        self.n_docs = n_docs
+        self.version = np.zeros(n_docs, dtype=np.int64)  # 0 = never written
+        self.updated_at = np.zeros(n_docs, dtype=np.float64)
+        self.length = np.zeros(n_docs, dtype=np.int64)
+        self.data = np.empty(n_docs, dtype=object)  # payload references (corpus slices are not copied)
+        self.cids: List[Optional[str]] = [None] * n_docs
+        self._slot: Dict[str, int] = {}  # cids outside the doc range only
+        self._next_free = n_docs
+        self.payload_bytes = 0
+        self.bytes_written = 0
+
+    def cid(self, doc: int) -> str:
+        c = self.cids[doc]
+        if c is None:
+            c = self.cids[doc] = sys.intern(f"{self.prefix}{doc}")
+        return c
+
+    def _grow(self, n: int):
+        n = max(n, 2 * len(self.version))
+        for name in ('version', 'updated_at', 'length', 'data'):
+            col = getattr(self, name)
+            new = np.empty(n, dtype=object) if col.dtype == object else np.zeros(n, dtype=col.dtype)
+            new[:len(col)] = col
+            setattr(self, name, new)
+        self.cids.extend([None] * (n - len(self.cids)))
+
+    def slot(self, cid: str, create: bool = True) -> Optional[int]:
+        # canonical doc cids map to their id by parsing; every other cid (including "doc:007" or
+        # non-ASCII digits, which int() would fold onto doc 7) takes a dict entry of its own
+        if cid.startswith(self.prefix):
+            tail = cid[self._plen:]
+            if (tail.isascii() and tail.isdigit() and (tail[0] != '0' or tail == '0')  # == str(int(tail))
+                    and (s := int(tail)) < self.n_docs):
+                return s
+        s = self._slot.get(cid)
+        if s is None and create:
+            s = self._next_free
+            self._next_free += 1
+            if s >= len(self.version):
+                self._grow(s + 1)
+            self.cids[s] = sys.intern(cid)
+            self._slot[self.cids[s]] = s
+        return s
+
+    def read_id(self, doc: int) -> Optional[ContextItem]:
+        v = self.version.item(doc)
+        if not v:
+            return None
+        return ContextItem(self.cids[doc] or self.cid(doc), v, self.data[doc], self.updated_at.item(doc))
+
+    def _put(self, doc: int, data: Payload) -> ContextItem:
+        now = self.clock.time()
+        n = len(data)
+        self.payload_bytes += n - self.length.item(doc)
+        self.bytes_written += n
+        v = self.version.item(doc) + 1
+        self.version[doc] = v
+        self.updated_at[doc] = now
+        self.length[doc] = n
+        self.data[doc] = data
+        return ContextItem(id=self.cid(doc), version=v, data=data, updated_at=now)
+
+    def write_id(self, doc: int, data: Payload) -> ContextItem:
+        with self._locks[doc % len(self._locks)]:
+            return self._put(doc, data)
+
+    def write_id_if_version(self, doc: int, expected: int, data: Payload) -> Tuple[bool, Optional[ContextItem]]:
+        with self._locks[doc % len(self._locks)]:
+            if self.version.item(doc) != expected:
+                return False, self.read_id(doc)
+            return True, self._put(doc, data)
+
+    def read(self, cid: str) -> Optional[ContextItem]:
+        s = self.slot(cid, create=False)
+        return None if s is None else self.read_id(s)
+
+    def latest(self, cid: str) -> Tuple[int, float]:
+        s = self.slot(cid, create=False)
+        return (0, 0.0) if s is None else (self.version.item(s), self.updated_at.item(s))
+
+    def write(self, cid: str, data: Payload) -> ContextItem:
+        return self.write_id(self.slot(cid), data)
+
+    def write_if_version(self, cid: str, expected: int, data: Payload) -> Tuple[bool, Optional[ContextItem]]:
+        return self.write_id_if_version(self.slot(cid), expected, data)
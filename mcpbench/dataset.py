@@ -0,0 +1,138 @@
+"""Hive-partitioned results dataset plus a single run-index table.
+
+    <results_dir>/dataset/ops/strategy=<S>/agents=<N>/workload=<W>/run_id=<rid>/part-0.parquet
+    <results_dir>/dataset/runs.parquet
+
+Each run's op parquet is hard-linked into its partition (copied across filesystems), so the
+dataset costs no extra disk; run-level config lives in the directory names and reads back as
+dictionary-encoded partition columns. runs.parquet holds one row per run (config columns,
+router/payload/measure stats, the full cfg as JSON), so analysis filters runs there and reads
+only the matching fragments instead of globbing raw files and parsing every manifest.
+"""
+import json, os, shutil, sys
+from pathlib import Path
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+try:
+    import fcntl
+except ImportError:  # no advisory locks: concurrent publishers must not share a results_dir
+    fcntl = None
+
+PARTITIONS = ('strategy', 'agents', 'workload', 'run_id')
+_dict = pa.dictionary(pa.int32(), pa.string())
+INDEX_SCHEMA = pa.schema([
+    ('run_id', pa.string()), ('strategy', _dict), ('agents', pa.int64()), ('workload', _dict),
+    ('access_pattern', _dict), ('context_tokens', pa.int64()), ('read_ratio', pa.float64()),
+    ('ops_per_sec', pa.float64()), ('mode', _dict), ('seed', pa.int64()),
+    ('rows', pa.int64()), ('measured_seconds', pa.float64()), ('early_stopped', pa.bool_()),
+    ('wire_bytes', pa.int64()), ('messages', pa.int64()), ('batch_mean', pa.float64()),
+    ('bytes_written', pa.int64()), ('fragment', pa.string()), ('cfg', pa.string()),
+])
+
+def root(results_dir) -> Path:
+    return Path(results_dir)/"dataset"
+
+def fragment_path(cfg) -> Path:
+    parts = (cfg['mcp']['strategy'], cfg['agents']['count'], cfg['workload'].get('type'), cfg['run_id'])
+    return Path("ops", *(f"{k}={v}" for k, v in zip(PARTITIONS, parts)), "part-0.parquet")
+
+def _index_row(manifest: dict, rows: int, fragment: Path) -> dict:
+    cfg = manifest.get('cfg', {})
+    wl, rt = cfg.get('workload', {}), manifest.get('router_stats') or {}
+    measure = manifest.get('measure') or {}
+    return {
+        'run_id': cfg['run_id'], 'strategy': cfg['mcp']['strategy'], 'agents': cfg['agents']['count'],
+        'workload': wl.get('type'), 'access_pattern': cfg.get('access_pattern', {}).get('type'),
+        'context_tokens': cfg.get('context', {}).get('size_tokens'), 'read_ratio': wl.get('read_ratio'),
+        'ops_per_sec': wl.get('ops_per_sec'), 'mode': cfg.get('measurement', {}).get('mode', 'wall'),
+        'seed': cfg.get('seed'), 'rows': rows,
+        'measured_seconds': measure.get('measured_seconds'), 'early_stopped': measure.get('early_stopped'),
+        'wire_bytes': rt.get('wire_bytes', 0), 'messages': rt.get('messages', 0),
+        'batch_mean': rt.get('batched_updates', 0) / max(1, rt.get('batches', 0)),
+        'bytes_written': (manifest.get('payload') or {}).get('bytes_written'),
+        'fragment': fragment.as_posix(), 'cfg': json.dumps(cfg, sort_keys=True, default=str),
+    }
+
+def _link(src: Path, dst: Path):
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dst.with_name(dst.name + f'.{os.getpid()}.tmp')
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+class _IndexLock:
+    def __init__(self, path: Path):
+        self.path = path.with_name(path.name + '.lock')
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = open(self.path, 'a')
+        if fcntl is not None:
+            fcntl.flock(self._f, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._f, fcntl.LOCK_UN)
+        self._f.close()
+
+def _upsert(index: Path, rows: list):
+    """Replace or add index rows by run_id; rewrites the (small) index file atomically."""
+    new = pa.Table.from_pylist(rows, schema=INDEX_SCHEMA)
+    with _IndexLock(index):
+        if index.exists():
+            old = pq.read_table(index).cast(INDEX_SCHEMA)
+            replaced = pc.is_in(old['run_id'], value_set=new['run_id'])
+            # a re-run whose config moved it to another partition leaves no stale fragment behind
+            for frag in set(old.filter(replaced)['fragment'].to_pylist()) - set(new['fragment'].to_pylist()):
+                (index.parent/frag).unlink(missing_ok=True)
+            new = pa.concat_tables([old.filter(pc.invert(replaced)), new])
+        new = new.sort_by('run_id').combine_chunks().unify_dictionaries()
+        tmp = index.with_name(index.name + f'.{os.getpid()}.tmp')
+        pq.write_table(new, tmp, compression='zstd')
+        os.replace(tmp, index)
+
+def _entry(results_dir: Path, manifest: dict):
+    cfg = manifest['cfg']
+    raw = results_dir/"raw"/f"{cfg['run_id']}.parquet"
+    frag = fragment_path(cfg)
+    _link(raw, root(results_dir)/frag)
+    return _index_row(manifest, pq.read_metadata(raw).num_rows, frag)
+
+def publish_run(results_dir, run_id: str):
+    """Add a finished run (raw parquet + manifest written) to the dataset and the run index."""
+    results_dir = Path(results_dir)
+    manifest = json.loads((results_dir/"agg"/f"{run_id}.manifest.json").read_text())
+    _upsert(root(results_dir)/"runs.parquet", [_entry(results_dir, manifest)])
+
+def rebuild(results_dir) -> int:
+    """(Re)index every run with a readable parquet and manifest, e.g. results from older layouts."""
+    results_dir = Path(results_dir)
+    rows = []
+    for mp in sorted((results_dir/"agg").glob("*.manifest.json")):
+        try:
+            rows.append(_entry(results_dir, json.loads(mp.read_text())))
+        except Exception as e:
+            print(f"[WARN] not indexed: {mp.name} ({e})", file=sys.stderr)
+    if rows:
+        _upsert(root(results_dir)/"runs.parquet", rows)
+    return len(rows)
+
+def run_index(results_dir='results', columns=None, filters=None) -> pa.Table:
+    """The run index, with parquet column pruning and row filters (pq.read_table `filters`)."""
+    return pq.read_table(root(results_dir)/"runs.parquet", columns=columns, filters=filters)
+
+def ops(results_dir='results') -> ds.Dataset:
+    """All runs' ops; partition columns (strategy, agents, workload, run_id) are dictionary-encoded,
+    and filters on them prune whole directories before any file is opened."""
+    return ds.dataset(root(results_dir)/"ops", format='parquet',
+                      partitioning=ds.HivePartitioning.discover(infer_dictionary=True))
+
+if __name__ == '__main__':
+    rd = sys.argv[1] if len(sys.argv) > 1 else 'results'
+    print(f"Indexed {rebuild(rd)} run(s) into {root(rd)}")
@@ -0,0 +1,86 @@
+import zlib
+from collections import deque
+from typing import Dict
+import numpy as np
+
+HEADER_BYTES = 24  # type, version, base version, body length; plus the cid itself
+
+def _as_bytes(data) -> bytes:
+    return data.encode() if isinstance(data, str) else bytes(data)
+
+def _u8(data) -> np.ndarray:
+    return np.frombuffer(data.encode() if isinstance(data, str) else data, dtype=np.uint8)
+
+def _compressor(name: str):
+    if name in (None, 'none'):
+        return None
+    if name == 'zlib':
+        return lambda b: zlib.compress(b, 1)
+    if name == 'zstd':
+        import zstandard  # optional
+        return zstandard.ZstdCompressor(level=1).compress
+    if name == 'lz4':
+        import lz4.frame  # optional
+        return lz4.frame.compress
+    raise ValueError(f"unknown compression: {name}")
+
+class UpdateCodec:
+    """Sizes router update messages as they would go on the wire.
+
+    encoding: 'full' ships the whole payload; 'delta' ships the changed span against the
+    version the recipient was last sent (full when that version is no longer retained);
+    'invalidate' ships version numbers only and readers fetch from the store.
+    """
+    KINDS = ('full', 'delta', 'invalidate')
+
+    def __init__(self, encoding: str = 'full', compression: str = 'none', history: int = 4):
+        if encoding not in self.KINDS:
+            raise ValueError(f"unknown update encoding: {encoding}")
+        self.encoding = encoding
+        self.compress = _compressor(compression)
+        self.history = history
+        self._versions: Dict[str, deque] = {}  # cid -> recent (version, data), newest last
+        self._memo: Dict[str, dict] = {}  # cid -> {base version: body bytes} for the newest version
+
+    def _body(self, data) -> int:
+        if self.compress is None:
+            return len(data.encode()) if isinstance(data, str) else len(data)
+        return len(self.compress(_as_bytes(data)))
+
+    def _delta(self, old, new) -> int:
+        a, b = _u8(old), _u8(new)
+        n = min(len(a), len(b))
+        diff = np.flatnonzero(a[:n] != b[:n])
+        prefix = int(diff[0]) if diff.size else n
+        rest = min(len(a), len(b)) - prefix
+        tail = np.flatnonzero(a[::-1][:rest] != b[::-1][:rest])
+        suffix = int(tail[0]) if tail.size else rest
+        return 8 + self._body(b[prefix:len(b) - suffix])  # 8: splice offset and removed length
+
+    def publish(self, cid: str, version: int, data):
+        """Register a committed version; later size() calls encode against it."""
+        self._memo[cid] = {}
+        if data is None or self.encoding != 'delta':
+            return
+        h = self._versions.get(cid)
+        if h is None:
+            h = self._versions[cid] = deque(maxlen=self.history)
+        h.append((version, data))
+
+    def size(self, cid: str, version: int, data, base: int) -> tuple[str, int]:
+        """(kind, bytes on the wire) for sending `version` to a recipient last sent `base`."""
+        head = HEADER_BYTES + len(cid)
+        if self.encoding == 'invalidate' or data is None:
+            return 'invalidate', head
+        memo = self._memo.setdefault(cid, {})  # base version (0 = full body) -> body bytes
+        if self.encoding == 'delta' and base:
+            n = memo.get(base)
+            if n is None:
+                old = next((d for v, d in self._versions.get(cid, ()) if v == base), None)
+                n = memo[base] = -1 if old is None else self._delta(old, data)
+            if n >= 0:
+                return 'delta', head + n
+        n = memo.get(0)
+        if n is None:
+            n = memo[0] = self._body(data)
+        return 'full', head + n
@@ -1,12 +1,46 @@
-from collections import defaultdict, deque
-from typing import Dict, Deque, Set
+import asyncio
+from collections import defaultdict, OrderedDict
+from typing import Dict, Set
+from .clock import WallClock
+from .encoding import UpdateCodec
 from .utils import sleep_ms
 
 class MessageRouter:
-    def __init__(self, delay_ms: int = 5):
+    """Per-agent inboxes hold at most one pending update per cid (the newest version wins)
+    and at most queue_capacity cids; when full the oldest pending update is dropped.
+
+    Each fan-out is sized per recipient by the update codec; delivery takes delay_ms plus
+    the encoded bytes over the sender's bandwidth_mbps link (0 = unlimited). A delta is sized
+    against the version last delivered to the recipient; each agent keeps at most
+    base_capacity such bases (LRU, 0 = unbounded), so an evicted cid goes out in full."""
+    def __init__(self, delay_ms: int = 5, clock=None, queue_capacity: int = 1024,
+                 codec: UpdateCodec = None, bandwidth_mbps: float = 0, base_capacity: int = 1024):
         self.delay_ms = delay_ms
+        self.clock = clock or WallClock()
+        self.queue_capacity = queue_capacity  # 0 = unbounded
+        self.codec = codec or UpdateCodec()
+        self.bandwidth_mbps = bandwidth_mbps
+        self.base_capacity = base_capacity
+        self.sent: Dict[int, OrderedDict] = defaultdict(OrderedDict)  # delta bases: agent id -> cid -> version delivered
         self.subscribers: Dict[str, Set[int]] = defaultdict(set)  # topic -> agent ids
-        self.queues: Dict[int, Deque] = defaultdict(deque)
+        self.queues: Dict[int, OrderedDict] = defaultdict(OrderedDict)  # agent id -> cid -> payload
+        self.enqueued = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.delivered = 0
+        self.depth = 0
+        self.max_depth = 0
+        self.wire_bytes = 0
+        self.msgs = {k: 0 for k in UpdateCodec.KINDS}
+        self.messages = 0  # wire messages: one per recipient per (multi-)update send
+        self.batches = 0
+        self.batched_updates = 0
+        self.max_batch = 0
+        self.batch_collapsed = 0  # writes to a cid already waiting in the sender's window
+        self.pending_senders = {}  # agent id -> strategy holding a batching window open
+
+    def register(self, agent_id: int):
+        self.queues.setdefault(agent_id, OrderedDict())
 
     def subscribe(self, agent_id: int, topic: str):
         self.subscribers[topic].add(agent_id)
@@ -14,19 +48,148 @@ class MessageRouter:
     def unsubscribe(self, agent_id: int, topic: str):
         self.subscribers[topic].discard(agent_id)
 
+    def _push(self, aid: int, payload: dict):
+        q = self.queues[aid]
+        key = payload.get('cid', id(payload))
+        cur = q.get(key)
+        if cur is not None:
+            if cur.get('version', 0) <= payload.get('version', 0):
+                q[key] = payload
+            self.coalesced += 1
+            return
+        if self.queue_capacity and len(q) >= self.queue_capacity:
+            q.popitem(last=False)
+            self.dropped += 1
+            self.depth -= 1
+        q[key] = payload
+        self.enqueued += 1
+        self.depth += 1
+        if self.depth > self.max_depth:
+            self.max_depth = self.depth
+
+    def delay_for(self, nbytes: int) -> float:
+        if not self.bandwidth_mbps:
+            return self.delay_ms
+        return self.delay_ms + nbytes * 8 / (self.bandwidth_mbps * 1000.0)
+
+    def _encode(self, recipients, payload: dict) -> int:
+        """Bytes on the wire to send payload to every recipient."""
+        cid, version, data = payload.get('cid'), payload.get('version', 0), payload.get('data')
+        if cid is None:
+            return 0
+        self.codec.publish(cid, version, data)
+        if self.codec.encoding != 'delta':  # size does not depend on what the recipient has
+            kind, n = self.codec.size(cid, version, data, 0)
+            self.msgs[kind] += len(recipients)
+            self.wire_bytes += n * len(recipients)
+            return n * len(recipients)
+        total = 0
+        for aid in recipients:
+            sent = self.sent.get(aid)
+            kind, n = self.codec.size(cid, version, data, sent.get(cid, 0) if sent else 0)
+            self.msgs[kind] += 1
+            total += n
+        self.wire_bytes += total
+        return total
+
+    def _send_cost(self, recipients, payloads) -> float:
+        """Account one multi-update message per recipient; returns its delivery delay (ms)."""
+        nbytes = sum(self._encode(recipients, p) for p in payloads)
+        self.messages += len(recipients)
+        self.batches += 1
+        self.batched_updates += len(payloads)
+        self.max_batch = max(self.max_batch, len(payloads))
+        return self.delay_for(nbytes)
+
+    def _fanout(self, recipients, payloads):
+        sleep_ms(self._send_cost(recipients, payloads), self.clock)
+        for aid in recipients:
+            for p in payloads:
+                self._push(aid, p)
+
+    def broadcast_many(self, from_id: int, payloads: list):
+        self._fanout([aid for aid in self.queues if aid != from_id], payloads)
+
+    def publish_many(self, topic: str, payloads: list):
+        self._fanout(list(self.subscribers.get(topic, ())), payloads)
+
     def broadcast(self, from_id: int, payload: dict):
-        sleep_ms(self.delay_ms)
-        for aid in list(self.queues.keys()):
-            if aid != from_id:
-                self.queues[aid].append(payload)
+        self.broadcast_many(from_id, [payload])
 
     def publish(self, topic: str, payload: dict):
-        sleep_ms(self.delay_ms)
-        for aid in self.subscribers.get(topic, set()):
-            self.queues[aid].append(payload)
+        self.publish_many(topic, [payload])
+
+    def flush_due(self):
+        """Close batching windows that have expired; senders register while a window is open."""
+        if self.pending_senders:
+            for strat in list(self.pending_senders.values()):
+                strat.flush_if_due()
+
+    def _received(self, aid: int, msgs):
+        """Delta bases advance only for updates the agent actually received (not dropped or coalesced away)."""
+        sent = self.sent[aid]
+        for p in msgs:
+            cid, version = p.get('cid'), p.get('version', 0)
+            if cid is None or p.get('data') is None or version <= sent.get(cid, 0):
+                continue
+            sent[cid] = version
+            sent.move_to_end(cid)
+            if self.base_capacity and len(sent) > self.base_capacity:
+                sent.popitem(last=False)
 
     def poll(self, agent_id: int):
         q = self.queues[agent_id]
         if q:
-            return q.popleft()
+            self.depth -= 1
+            self.delivered += 1
+            msg = q.popitem(last=False)[1]
+            if self.codec.encoding == 'delta':
+                self._received(agent_id, (msg,))
+            return msg
         return None
+
+    def poll_all(self, agent_id: int) -> list:
+        q = self.queues[agent_id]
+        if not q:
+            return []
+        msgs = list(q.values())
+        q.clear()
+        self.depth -= len(msgs)
+        self.delivered += len(msgs)
+        if self.codec.encoding == 'delta':
+            self._received(agent_id, msgs)
+        return msgs
+
+    def stats(self) -> dict:
+        return {'enqueued': self.enqueued, 'coalesced': self.coalesced, 'dropped': self.dropped,
+                'delivered': self.delivered, 'depth': self.depth, 'max_depth': self.max_depth,
+                'wire_bytes': self.wire_bytes, **{f'msgs_{k}': n for k, n in self.msgs.items()},
+                'messages': self.messages, 'batches': self.batches, 'batched_updates': self.batched_updates,
+                'batch_collapsed': self.batch_collapsed, 'max_batch': self.max_batch}
+
+class AsyncMessageRouter(MessageRouter):
+    """Delivery delay is a timer on the running event loop; senders never block.
+
+    All recipients of one message share the same delay, so one timer delivers to
+    every recipient queue instead of one timer per recipient.
+    """
+    def __init__(self, delay_ms: int = 5, clock=None, queue_capacity: int = 1024,
+                 codec: UpdateCodec = None, bandwidth_mbps: float = 0, base_capacity: int = 1024):
+        super().__init__(delay_ms, clock, queue_capacity, codec, bandwidth_mbps, base_capacity)
+        self.in_flight = 0
+
+    def _fanout(self, recipients, payloads):
+        if not recipients:
+            return
+        delay = self._send_cost(recipients, payloads)
+        self.in_flight += 1
+        asyncio.get_running_loop().call_later(delay/1000.0, self._deliver, recipients, payloads)
+
+    def _deliver(self, recipients, payloads):
+        self.in_flight -= 1
+        for aid in recipients:
+            for p in payloads:
+                self._push(aid, p)
+
+    def stats(self) -> dict:
+        return {**super().stats(), 'in_flight': self.in_flight}
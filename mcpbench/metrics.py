@@ -1,48 +1,316 @@
-import csv, time
+import csv, json, math, os
+from array import array
 from dataclasses import dataclass
 from pathlib import Path
-import pandas as pd
+import numpy as np
 import pyarrow as pa, pyarrow.parquet as pq
 import psutil
+from .clock import WallClock
+from .sketch import LogHistogram
+from .utils import bootstrap_ci
 
 @dataclass
 class SysSample:
     ts: float
     cpu: float
     mem: float
+    queued: int = 0
+    dropped: int = 0
+    wire_bytes: int = 0
+
+OP_KINDS = ('read', 'write')
+
+class RunSketches:
+    """Per-run latency/staleness histograms split by op type, merged across runs in analysis."""
+    METRICS = ('latency_ms', 'response_ms', 'staleness_ms', 'versions_behind')
+
+    def __init__(self, run_id: str, strategy: str = 'NA'):
+        self.run_id = run_id
+        self.strategy = strategy
+        self.hists = {m: {op: LogHistogram() for op in OP_KINDS} for m in self.METRICS}
+        self.count = 0
+        self.conflicts = 0
+        self.retries = 0
+        self.t_min = math.inf
+        self.t_max = -math.inf
+
+    def add_chunk(self, op_codes: np.ndarray, start: np.ndarray, end: np.ndarray, conflict: np.ndarray,
+                  retries: np.ndarray, **cols):
+        for code, op in enumerate(OP_KINDS):
+            sel = op_codes == code
+            for m in self.METRICS:
+                self.hists[m][op].add(cols[m][sel])
+        self.count += int(op_codes.size)
+        self.conflicts += int(conflict.sum())
+        self.retries += int(retries.sum())
+        self.t_min = min(self.t_min, float(start.min()))
+        self.t_max = max(self.t_max, float(end.max()))
+
+    def merge(self, other: 'RunSketches') -> 'RunSketches':
+        for m, by_op in self.hists.items():
+            for op, h in by_op.items():
+                h.merge(other.hists[m][op])
+        self.count += other.count
+        self.conflicts += other.conflicts
+        self.retries += other.retries
+        self.t_min = min(self.t_min, other.t_min)
+        self.t_max = max(self.t_max, other.t_max)
+        return self
+
+    @classmethod
+    def from_dict(cls, d: dict) -> 'RunSketches':
+        sk = cls(d['run_id'], d.get('strategy', 'NA'))
+        for m, by_op in d['hist'].items():  # sketches written before a metric existed keep it empty
+            sk.hists[m] = {op: LogHistogram.from_dict(h) for op, h in by_op.items()}
+        sk.count = d['count']
+        sk.conflicts = d['conflicts']
+        sk.retries = d.get('retries', 0)
+        sk.t_min = math.inf if d['t_min'] is None else d['t_min']
+        sk.t_max = -math.inf if d['t_max'] is None else d['t_max']
+        return sk
+
+    def to_dict(self) -> dict:
+        return {
+            'run_id': self.run_id, 'strategy': self.strategy, 'count': self.count, 'conflicts': self.conflicts,
+            'retries': self.retries,
+            't_min': self.t_min if self.count else None, 't_max': self.t_max if self.count else None,
+            'hist': {m: {op: h.to_dict() for op, h in by_op.items()} for m, by_op in self.hists.items()},
+        }
+
+class OpRecorder:
+    """Typed per-column op buffers, flushed to Parquet one row group per chunk."""
+    SCHEMA = pa.schema([
+        ('op_id', pa.int32()), ('op', pa.string()), ('cid', pa.string()),
+        ('start', pa.float64()), ('end', pa.float64()), ('latency_ms', pa.float64()),
+        ('success', pa.bool_()), ('staleness_ms', pa.float64()), ('conflict', pa.bool_()),
+        ('version_seen', pa.int64()), ('intended_start', pa.float64()), ('response_ms', pa.float64()),
+        ('retries', pa.int16()), ('versions_behind', pa.int32()),
+    ])
+
+    def __init__(self, path: Path, chunk_rows: int = 65536, sketches: RunSketches = None):
+        self.path = Path(path)
+        self.sketches = sketches
+        self._part = self.path.with_name(self.path.name + '.part')
+        self.chunk_rows = chunk_rows
+        self.rows = 0
+        self._op_codes = {k: i for i, k in enumerate(OP_KINDS)}
+        self._cid_codes = {}
+        self._cids = []
+        self._cid_dict = pa.array([], pa.string())
+        self._writer = None
+        self._reset()
+
+    def _reset(self):
+        self.op_id, self.op, self.cid = array('i'), array('b'), array('i')
+        self.start, self.end, self.intended = array('d'), array('d'), array('d')
+        self.success, self.conflict = array('b'), array('b')
+        self.staleness, self.version = array('d'), array('q')
+        self.retries, self.behind = array('h'), array('i')
+
+    def append(self, op_id, op, cid, start, end, success, staleness_ms, conflict, version_seen, intended, retries=0,
+               versions_behind=0):
+        code = self._cid_codes.get(cid)
+        if code is None:
+            code = self._cid_codes[cid] = len(self._cids)
+            self._cids.append(cid)
+        self.op_id.append(op_id); self.op.append(self._op_codes[op]); self.cid.append(code)
+        self.start.append(start); self.end.append(end); self.intended.append(intended)
+        self.success.append(success); self.conflict.append(conflict)
+        self.staleness.append(staleness_ms); self.version.append(version_seen)
+        self.retries.append(retries); self.behind.append(versions_behind)
+        if len(self.op_id) >= self.chunk_rows:
+            self.flush()
+
+    def _table(self) -> pa.Table:
+        f64 = lambda a: np.frombuffer(a, dtype=np.float64)
+        start, end, intended = f64(self.start), f64(self.end), f64(self.intended)
+        op_codes = np.frombuffer(self.op, dtype=np.int8)
+        latency, response, staleness = (end - start)*1000.0, (end - intended)*1000.0, f64(self.staleness)
+        conflict = np.frombuffer(self.conflict, dtype=np.int8).astype(bool)
+        retries = np.frombuffer(self.retries, dtype=np.int16)
+        behind = np.frombuffer(self.behind, dtype=np.int32)
+        if self.sketches is not None:
+            self.sketches.add_chunk(op_codes, start, end, conflict, retries,
+                                    latency_ms=latency, response_ms=response, staleness_ms=staleness,
+                                    versions_behind=behind)
+        if len(self._cid_dict) != len(self._cids):
+            self._cid_dict = pa.array(self._cids, pa.string())
+        cols = [
+            np.frombuffer(self.op_id, dtype=np.int32),
+            pa.array(OP_KINDS, pa.string()).take(pa.array(op_codes)),
+            self._cid_dict.take(pa.array(np.frombuffer(self.cid, dtype=np.int32))),
+            start, end, latency,
+            np.frombuffer(self.success, dtype=np.int8).astype(bool),
+            staleness, conflict,
+            np.frombuffer(self.version, dtype=np.int64),
+            intended, response, retries, behind,
+        ]
+        return pa.Table.from_arrays([pa.array(c) if isinstance(c, np.ndarray) else c for c in cols], schema=self.SCHEMA)
+
+    def flush(self):
+        if not len(self.op_id):
+            return
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self._part, self.SCHEMA)
+        self._writer.write_table(self._table())
+        self.rows += len(self.op_id)
+        self._reset()
+
+    def discard(self):
+        """Drop everything recorded so far (buffered and already flushed)."""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._part.unlink(missing_ok=True)
+        self._reset()
+        self.rows = 0
+
+    def close(self):
+        self.flush()
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self._part, self.SCHEMA)
+        self._writer.close()
+        os.replace(self._part, self.path)
+
+class EarlyStop:
+    """Ends a measure phase once the bootstrap CIs of mean per-window p95 latency and of
+    mean per-window throughput are both narrower than rel_ci_width of their means (or, for
+    near-zero p95, than abs_ci_ms)."""
+    def __init__(self, enabled: bool = False, window_seconds: float = 10, min_windows: int = 6,
+                 rel_ci_width: float = 0.1, abs_ci_ms: float = 0.1, n_boot: int = 1000):
+        self.enabled = enabled
+        self.window_seconds = window_seconds
+        self.min_windows = min_windows
+        self.rel_ci_width = rel_ci_width
+        self.abs_ci_ms = abs_ci_ms
+        self.n_boot = n_boot
+
+    def converged(self, windows: list) -> bool:
+        if not self.enabled or len(windows) < self.min_windows:
+            return False
+        for key, floor in (('p95', self.abs_ci_ms), ('throughput', 0.0)):
+            x = [w[key] for w in windows]
+            lo, hi = bootstrap_ci(x, self.n_boot)
+            if (hi - lo) > max(self.rel_ci_width * abs(sum(x) / len(x)), floor):
+                return False
+        return True
+
+ROUTER_GAUGES = ('depth', 'max_depth', 'in_flight')  # router stats that are levels, not running counts
 
 class Metrics:
-    def __init__(self, results_dir: str, run_id: str, log_interval: int):
+    def __init__(self, results_dir: str, run_id: str, log_interval: int, clock=None, chunk_rows: int = 65536,
+                 strategy: str = 'NA'):
+        self.clock = clock or WallClock()
         self.results_dir = Path(results_dir)
         self.run_id = run_id
         self.log_interval = log_interval
-        self.ops = []
         self.persec = []
         (self.results_dir/"raw").mkdir(parents=True, exist_ok=True)
         (self.results_dir/"agg").mkdir(parents=True, exist_ok=True)
-        self._last_flush = time.time()
+        self.chunk_rows = chunk_rows
+        self._new_recorder(strategy)
+        self.router = None
+        self._caches = None
+        self._router0 = {}
+        self._caches0 = {}
+        self._last_flush = self.clock.time()
+        self.windows = []  # per-window p95 / throughput during the measure phase
+        self.stopped = False
+        self._stop = None
+        self._measure_t0 = None
+        self._measured = None
+
+    def _new_recorder(self, strategy: str):
+        self.sketches = RunSketches(self.run_id, strategy)
+        self.ops = OpRecorder(self.results_dir/"raw"/f"{self.run_id}.parquet", self.chunk_rows, self.sketches)
+        self.record = self.ops.append
+
+    def watch_router(self, router):
+        self.router = router
+
+    def watch_caches(self, cache_stats):
+        """cache_stats() -> {tier: {'hits', 'misses', 'evictions', ...}} summed over the run's caches."""
+        self._caches = cache_stats
+
+    def router_stats(self) -> dict:
+        """Router counters accumulated since begin_measure (gauges as they are now)."""
+        if self.router is None:
+            return {}
+        return {k: v if k in ROUTER_GAUGES else v - self._router0.get(k, 0) for k, v in self.router.stats().items()}
+
+    def cache_stats(self) -> dict:
+        """Cache counters accumulated since begin_measure, per tier."""
+        if self._caches is None:
+            return {}
+        out = {}
+        for tier, st in self._caches().items():
+            base = self._caches0.get(tier, {})
+            acc = out[tier] = {k: v - base.get(k, 0) for k, v in st.items() if k != 'hit_ratio'}
+            acc['hit_ratio'] = acc['hits'] / max(1, acc['hits'] + acc['misses'])
+        return out
+
+    def record_op(self, o):
+        self.ops.append(o.op_id, o.op, o.cid, o.start, o.end, o.success, o.staleness_ms,
+                        o.conflict, o.version_seen, o.intended_start or o.start, o.retries,
+                        o.versions_behind)
+
+    def begin_measure(self, early_stop: dict = None):
+        """Start the measured window: warmup ops recorded so far are discarded, so a run's parquet,
+        sketches and per-second log cover measure + cooldown whether or not it forked after warmup.
+        Router and cache counters are snapshotted so the manifest reports the measured window only.
+        Per-window estimates start here; with early_stop enabled, `stopped` flips once they converge."""
+        self.ops.discard()
+        if self.router is not None:
+            self._router0 = self.router.stats()
+            self.router.max_depth = self.router.depth  # high-water mark of the measured window
+        self._caches0 = self._caches() if self._caches is not None else {}
+        self._new_recorder(self.sketches.strategy)
+        self.persec = []
+        self._stop = EarlyStop(**(early_stop or {}))
+        self._measure_t0 = self._win_t0 = self.clock.time()
+        self._win_row = self.ops.rows + len(self.ops.op_id)
+
+    def _close_window(self, now):
+        ops = self.ops
+        total = ops.rows + len(ops.op_id)
+        # rows flushed to parquet mid-window are no longer buffered; the window then uses the rest
+        i0 = max(0, self._win_row - ops.rows)
+        # response time from the intended start, the coordinated-omission corrected p95 the summary reports
+        intended = np.frombuffer(ops.intended, dtype=np.float64)[i0:]
+        end = np.frombuffer(ops.end, dtype=np.float64)[i0:len(ops.op_id)]
+        if end.size:
+            self.windows.append({'t': now - self._measure_t0,
+                                 'p95': float(np.percentile((end - intended)*1000.0, 95)),
+                                 'throughput': (total - self._win_row) / (now - self._win_t0)})
+        self._win_t0, self._win_row = now, total
+        if self._stop.converged(self.windows):
+            self.stopped = True
+
+    def end_measure(self):
+        """Mark the end of the measure phase (full length, or where early stopping cut it)."""
+        if self._measure_t0 is not None:
+            self._measured = self.clock.time() - self._measure_t0
 
-    def record_op(self, opres):
-        self.ops.append(opres)
+    def measure_summary(self) -> dict:
+        return {'windows': self.windows, 'early_stopped': self.stopped, 'measured_seconds': self._measured}
 
     def tick(self):
-        now = time.time()
+        now = self.clock.time()
+        if self._stop is not None and not self.stopped and now - self._win_t0 >= self._stop.window_seconds:
+            self._close_window(now)
         if now - self._last_flush >= self.log_interval:
             self._last_flush = now
-            self.persec.append(SysSample(now, psutil.cpu_percent(), psutil.virtual_memory().percent))
+            r = self.router
+            self.persec.append(SysSample(now, psutil.cpu_percent(), psutil.virtual_memory().percent,
+                                         r.depth if r else 0, r.dropped if r else 0, r.wire_bytes if r else 0))
 
     def finalize(self):
-        rows = [{
-            'op_id': o.op_id, 'op': o.op, 'cid': o.cid,
-            'start': o.start, 'end': o.end, 'latency_ms': (o.end - o.start)*1000.0,
-            'success': o.success, 'staleness_ms': o.staleness_ms,
-            'conflict': o.conflict, 'version_seen': o.version_seen
-        } for o in self.ops]
-        table = pa.Table.from_pandas(pd.DataFrame(rows))
-        pq.write_table(table, self.results_dir/"raw"/f"{self.run_id}.parquet")
+        self.ops.close()
+        with open(self.results_dir/"agg"/f"{self.run_id}.sketch.json", 'w') as f:
+            json.dump(self.sketches.to_dict(), f)
 
         with open(self.results_dir/"agg"/f"{self.run_id}.csv", 'w', newline='') as f:
             w = csv.writer(f)
-            w.writerow(['ts','cpu','mem'])
+            w.writerow(['ts','cpu','mem','queued','dropped','wire_bytes'])
             for s in self.persec:
-                w.writerow([s.ts, s.cpu, s.mem])
+                w.writerow([s.ts, s.cpu, s.mem, s.queued, s.dropped, s.wire_bytes])
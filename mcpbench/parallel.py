@@ -0,0 +1,153 @@
+import csv, json, os, queue, shutil
+import multiprocessing as mp
+from pathlib import Path
+import pyarrow.parquet as pq
+from .clock import WallClock
+from .metrics import Metrics, OpRecorder, RunSketches
+from .sharded_store import ShardedContextStore, serve_shard
+from .runner import drive, _mk_l2_groups, _close_l2_groups, _run_stats, _dump_manifest, _publish
+
+def _worker(cfg, rank, n_workers, conns, l2_lock, out_q):
+    clock = WallClock()
+    store = ShardedContextStore(conns, clock=clock)
+    part_dir = Path(cfg['results_dir'])/".parts"/cfg['run_id']/f"w{rank}"
+    metrics = Metrics(part_dir, cfg['run_id'], cfg['measurement']['log_interval_seconds'], clock=clock,
+                      strategy=cfg['mcp']['strategy'])
+    l2_groups = _mk_l2_groups(cfg, attach=True, lock=l2_lock)
+    agents = drive(cfg, clock, store, metrics, range(rank, cfg['agents']['count'], n_workers),
+                   cfg['workload']['ops_per_sec'] / n_workers, cfg['seed'] + rank, l2_groups)
+    metrics.finalize()
+    store.close()
+    _close_l2_groups(l2_groups)
+    out_q.put((rank, _run_stats(agents, metrics)))
+
+def _merge_cache_stats(per_worker):
+    out = {}
+    for stats in per_worker:
+        for tier, st in stats.items():
+            acc = out.setdefault(tier, {'hits': 0, 'misses': 0, 'evictions': 0})
+            for k, v in st.items():
+                if k != 'hit_ratio':
+                    acc[k] = acc.get(k, 0) + v
+    for acc in out.values():
+        acc['hit_ratio'] = acc['hits'] / max(1, acc['hits'] + acc['misses'])
+    return out
+
+def _merge_router_stats(per_worker):
+    out = {}
+    for st in per_worker:
+        for k, v in st.items():
+            out[k] = max(out.get(k, 0), v) if k.startswith('max_') else out.get(k, 0) + v
+    return out
+
+def _merge_ha_switches(per_worker):
+    # each worker runs its own controller over its agents
+    return sorted(({**sw, 'worker': rank} for rank, sws in enumerate(per_worker) for sw in sws),
+                  key=lambda sw: sw['t'])
+
+def _merge_measure(per_worker):
+    # windows close on each worker's own ticks; the i-th windows are merged: throughput adds up,
+    # p95 is the worst worker's (an upper bound on the run-wide p95 of that window)
+    per_worker = list(per_worker)
+    windows = []
+    for ws in zip(*(m['windows'] for m in per_worker)):
+        windows.append({'t': max(w['t'] for w in ws), 'p95': max(w['p95'] for w in ws),
+                        'throughput': sum(w['throughput'] for w in ws)})
+    measured = [m['measured_seconds'] for m in per_worker if m['measured_seconds'] is not None]
+    return {'windows': windows, 'early_stopped': any(m['early_stopped'] for m in per_worker),
+            'measured_seconds': max(measured) if measured else None}
+
+def _merge_parts(rs: Path, rid: str, part_dirs):
+    out = rs/"raw"/f"{rid}.parquet"
+    tmp = out.with_name(out.name + '.part')
+    with pq.ParquetWriter(tmp, OpRecorder.SCHEMA) as w:
+        for d in part_dirs:
+            pf = pq.ParquetFile(d/"raw"/f"{rid}.parquet")
+            for i in range(pf.num_row_groups):
+                w.write_table(pf.read_row_group(i))
+    os.replace(tmp, out)
+
+    sk = None
+    for d in part_dirs:
+        part = RunSketches.from_dict(json.loads((d/"agg"/f"{rid}.sketch.json").read_text()))
+        sk = part if sk is None else sk.merge(part)
+    (rs/"agg"/f"{rid}.sketch.json").write_text(json.dumps(sk.to_dict()))
+
+    header, rows = None, []
+    for d in part_dirs:
+        with open(d/"agg"/f"{rid}.csv", newline='') as f:
+            part = list(csv.reader(f))
+        header = part[0]
+        rows.extend(part[1:])
+    rows.sort(key=lambda r: float(r[0]))
+    with open(rs/"agg"/f"{rid}.csv", 'w', newline='') as f:
+        w = csv.writer(f)
+        w.writerow(header)
+        w.writerows(rows)
+
+def run_parallel(cfg):
+    """Agents partitioned over worker processes; ContextStore sharded over store processes by
+    consistent hashing of cid. Workers talk to every shard over its own Pipe, each writes its
+    own Metrics part, and the parts are merged into one run at the end."""
+    if cfg['measurement'].get('mode', 'wall') == 'sim':
+        raise ValueError("execution.workers/store_shards require measurement.mode: wall")
+    ex = cfg.get('execution') or {}
+    n_workers = max(1, min(ex.get('workers', 1), cfg['agents']['count']))
+    if n_workers > 1 and cfg['mcp']['strategy'] in ('BC', 'PS', 'HA'):
+        # each worker has its own MessageRouter, so fan-out would only reach agents in the sender's process
+        raise ValueError(f"mcp.strategy {cfg['mcp']['strategy']} fans updates out through a per-process router; "
+                         f"use execution.workers: 1 (store_shards still applies)")
+    n_shards = max(1, ex.get('store_shards', 1))
+    rs = Path(cfg['results_dir']); rid = cfg['run_id']
+    parts = rs/".parts"/rid
+    shutil.rmtree(parts, ignore_errors=True)
+    (rs/"raw").mkdir(parents=True, exist_ok=True)
+    (rs/"agg").mkdir(parents=True, exist_ok=True)
+
+    ctx = mp.get_context('spawn')  # no inherited pipe ends or module state
+    pipes = [[ctx.Pipe() for _ in range(n_shards)] for _ in range(n_workers)]
+    l2_lock = ctx.Lock()
+    l2_groups = _mk_l2_groups(cfg, lock=l2_lock)
+    out_q = ctx.Queue()
+    store_kind, n_docs = cfg['context'].get('store', 'dict'), cfg['context'].get('n_docs', 10_000)
+    shards = [ctx.Process(target=serve_shard, args=([pipes[w][s][1] for w in range(n_workers)], out_q, ('shard', s),
+                                                    store_kind, n_docs), daemon=True)
+              for s in range(n_shards)]
+    workers = [ctx.Process(target=_worker, args=(cfg, w, n_workers, [pipes[w][s][0] for s in range(n_shards)],
+                                                 l2_lock, out_q))
+               for w in range(n_workers)]
+    try:
+        for p in shards + workers:
+            p.start()
+        for row in pipes:
+            for a, b in row:
+                a.close(); b.close()
+
+        stats = {}  # worker rank -> run stats; ('shard', s) -> payload bytes
+        while len(stats) < n_workers + n_shards:
+            try:
+                key, st = out_q.get(timeout=1.0)
+                stats[key] = st
+            except queue.Empty:
+                dead = [p for p in workers + shards if p.exitcode not in (None, 0)]
+                if dead:
+                    raise RuntimeError(f"{len(dead)} worker process(es) failed for {rid}")
+        for p in workers + shards:
+            p.join()
+    finally:
+        for p in workers + shards:
+            if p.is_alive():
+                p.terminate()
+        _close_l2_groups(l2_groups)
+
+    _merge_parts(rs, rid, [parts/f"w{w}" for w in range(n_workers)])
+    shutil.rmtree(parts, ignore_errors=True)
+    per_worker = [stats[w] for w in range(n_workers)]
+    _dump_manifest(cfg, {
+        "cache_stats": _merge_cache_stats(st['cache_stats'] for st in per_worker),
+        "router_stats": _merge_router_stats(st['router_stats'] for st in per_worker),
+        "ha_switches": _merge_ha_switches(st['ha_switches'] for st in per_worker),
+        "measure": _merge_measure(st['measure'] for st in per_worker),
+    }, {k: sum(stats[('shard', s)][k] for s in range(n_shards)) for k in ('resident_bytes', 'bytes_written')})
+    _publish(cfg)
+    print("Finished", rid)
@@ -0,0 +1,109 @@
+import mmap, os, random, struct
+from pathlib import Path
+import numpy as np
+
+MAGIC = b'MCPBCRP1'
+BYTES_PER_TOKEN = 4  # rough UTF-8 bytes per model token for English passages
+_HEADER = struct.Struct('<8sQ')  # magic, passage count; then uint64 offsets[count+1], then text
+
+def _synthetic_passages(seed: int, target_bytes: int):
+    rng = np.random.default_rng(seed)
+    letters = np.frombuffer(b'abcdefghijklmnopqrstuvwxyz', dtype=np.uint8)
+    vocab = [letters[rng.integers(0, 26, size=n)].tobytes() for n in rng.integers(2, 11, size=5000)]
+    ranks = 1.0 / np.arange(1, len(vocab) + 1)  # Zipf-like word frequencies
+    cdf = np.cumsum(ranks / ranks.sum())
+    total = 0
+    while total < target_bytes:
+        words = np.searchsorted(cdf, rng.random(int(rng.integers(40, 121))))
+        p = b' '.join(vocab[min(w, len(vocab) - 1)] for w in words) + b'.'
+        total += len(p)
+        yield p
+
+def _msmarco_passages(collection: Path, target_bytes: int):
+    total = 0
+    with open(collection, 'rb') as f:
+        for line in f:
+            parts = line.rstrip(b'\r\n').split(b'\t', 1)
+            if len(parts) < 2 or not parts[1]:
+                continue
+            total += len(parts[1])
+            yield parts[1]
+            if total >= target_bytes:
+                break
+
+def build_corpus(out, source: str = 'synthetic', seed: int = 42, max_mb: int = 16,
+                 collection='.data/msmarco/collection.tsv') -> Path:
+    """Write a corpus file once: header, passage offsets, then the concatenated passage bytes."""
+    out = Path(out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    target = max_mb << 20
+    if source == 'msmarco':
+        passages = list(_msmarco_passages(Path(collection), target))
+    elif source == 'synthetic':
+        passages = list(_synthetic_passages(seed, target))
+    else:
+        raise ValueError(f"unknown corpus source: {source}")
+    if not passages:
+        raise ValueError(f"corpus source {source} produced no passages")
+    offsets = np.zeros(len(passages) + 1, dtype=np.uint64)
+    np.cumsum([len(p) for p in passages], out=offsets[1:])
+    tmp = out.with_name(out.name + f'.{os.getpid()}.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, len(passages)))
+        f.write(offsets.tobytes())
+        for p in passages:
+            f.write(p)
+    os.replace(tmp, out)  # concurrent builders race harmlessly to identical content
+    return out
+
+class PayloadCorpus:
+    """Memory-mapped corpus handing out payloads of size_tokens worth of text.
+
+    A doc's first write is a zero-copy memoryview slice; each later write rewrites one span of
+    edit_fraction of the previous version with other corpus text, so successive versions share
+    most of their bytes like real document edits (0 = an unrelated passage every write)."""
+    def __init__(self, path, size_tokens: int, edit_fraction: float = 0.05, seed: int = 0):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, n = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a payload corpus")
+        self.n_passages = n
+        self.offsets = np.frombuffer(self._mm, dtype=np.uint64, count=n + 1, offset=_HEADER.size)
+        base = _HEADER.size + 8 * (n + 1)
+        self._text = memoryview(self._mm)[base:]
+        self.size_bytes = min(len(self._text), size_tokens * BYTES_PER_TOKEN)
+        self.edit_bytes = max(1, int(self.size_bytes * edit_fraction)) if edit_fraction > 0 else 0
+        self._writes = 0
+        self._last = {}  # doc id -> previous version (the store references the same object)
+        self._rng = random.Random(seed)
+
+    @classmethod
+    def for_config(cls, cfg) -> 'PayloadCorpus':
+        pc = cfg['context'].get('payload') or {}
+        source = pc.get('source', 'synthetic')
+        path = Path(pc.get('corpus') or f".data/corpus/{source}-{cfg['seed']}.bin")
+        if not path.exists():
+            build_corpus(path, source, seed=cfg['seed'], max_mb=pc.get('max_mb', 16),
+                         collection=pc.get('collection', '.data/msmarco/collection.tsv'))
+        return cls(path, cfg['context']['size_tokens'], pc.get('edit_fraction', 0.05), cfg['seed'])
+
+    def _passage(self, doc_id: int, n: int) -> memoryview:
+        # a different passage start per call
+        i = (doc_id * 7919 + self._writes) % self.n_passages
+        self._writes += 1
+        start = min(int(self.offsets[i]), len(self._text) - n)
+        return self._text[start:start + n]
+
+    def get(self, doc_id: int):
+        prev = self._last.get(doc_id) if self.edit_bytes else None
+        if prev is None:
+            data = self._passage(doc_id, self.size_bytes)
+        else:
+            n = min(self.edit_bytes, len(prev))
+            at = self._rng.randrange(len(prev) - n + 1)
+            data = b''.join((prev[:at], self._passage(doc_id, n), prev[at + n:]))
+        if self.edit_bytes:
+            self._last[doc_id] = data
+        return data
@@ -1,82 +1,469 @@
-import time, json
+import asyncio, copy, hashlib, json, os, shutil, sys, tempfile, traceback
 from pathlib import Path
+from .clock import WallClock, VirtualClock, EventLoop
 from .config import load_config
-from .context_store import ContextStore
-from .message_router import MessageRouter
+from .context_store import ContextStore, ArrayContextStore
+from .message_router import MessageRouter, AsyncMessageRouter
 from .metrics import Metrics
 from .agent import Agent
 from .workload import Workload, AccessSampler
+from .payload import PayloadCorpus, BYTES_PER_TOKEN
+from .encoding import UpdateCodec
+from .dataset import publish_run
+from .cache import make_cache
+from .shm_cache import SharedGroupCache
 from .strategies.broadcast import Broadcast
 from .strategies.pubsub import PubSub
 from .strategies.pull_on_demand import PullOnDemand
 from .strategies.hierarchical_cache import HierarchicalCache
-from .strategies.hybrid_adaptive import HybridAdaptive
+from .strategies.hybrid_adaptive import HybridAdaptive, HybridController, select
 
-def _mk_strategy(name, agent_id, store, router, cfg):
+def _weigher(cfg):
+    # cache capacities are counted in entries, configured context tokens, or payload bytes
+    unit = cfg['mcp'].get('capacity_unit', 'entries')
+    if unit == 'tokens':
+        tokens = cfg['context']['size_tokens']
+        return lambda item: tokens
+    if unit == 'bytes':
+        return lambda item: len(item.data)
+    return None
+
+def _check_capacities(cfg):
+    # l1/l2_capacity are in capacity_unit; a tier that cannot hold one entry would reject every put
+    mcp = cfg['mcp']
+    unit = mcp.get('capacity_unit', 'entries')
+    if unit == 'entries' or mcp['strategy'] not in ('HC', 'HA'):
+        return
+    entry = cfg['context']['size_tokens'] if unit == 'tokens' else _payload_bytes(cfg)
+    tiers = ['l1_capacity'] + (['l2_capacity'] if mcp.get('l2_backend', 'local') != 'shm' else [])
+    for key in tiers:
+        if mcp[key] < entry:
+            raise ValueError(f"mcp.{key}={mcp[key]} {unit} is smaller than one entry ({entry} {unit}); "
+                             f"capacities are in capacity_unit")
+
+def _cache_stats(agents):
+    out, seen = {}, set()
+    for a in agents:
+        for tier, cache in a.strategy.cache_tiers().items():
+            if id(cache) in seen:
+                continue
+            seen.add(id(cache))
+            acc = out.setdefault(tier, {'hits': 0, 'misses': 0, 'evictions': 0})
+            for k in acc:
+                acc[k] += getattr(cache, k)
+            if hasattr(cache, 'oversize'):  # shm L2: puts too large for a slot
+                acc['oversize'] = acc.get('oversize', 0) + cache.oversize
+    for acc in out.values():
+        acc['hit_ratio'] = acc['hits'] / max(1, acc['hits'] + acc['misses'])
+    return out
+
+def _mk_payloads(cfg):
+    # returns payload(doc_id, op): a corpus slice of context.size_tokens for writes, None for reads
+    source = (cfg['context'].get('payload') or {}).get('source', 'synthetic')
+    if source == 'constant':
+        return lambda doc, op: "X" if op == 'write' else None
+    corpus = PayloadCorpus.for_config(cfg)
+    return lambda doc, op: corpus.get(doc) if op == 'write' else None
+
+def _mk_store(cfg, clock):
+    if cfg['context'].get('store', 'dict') == 'array':
+        return ArrayContextStore(cfg['context'].get('n_docs', 10_000), clock=clock)
+    return ContextStore(clock=clock)
+
+def _ha_switches(agents):
+    ctl = getattr(agents[0].strategy, 'controller', None) if agents else None
+    return ctl.history if ctl is not None else []
+
+def _payload_bytes(cfg) -> int:
+    # bytes per written document (PayloadCorpus slices context.size_tokens worth of text)
+    if (cfg['context'].get('payload') or {}).get('source', 'synthetic') == 'constant':
+        return 1
+    return cfg['context']['size_tokens'] * BYTES_PER_TOKEN
+
+def _l2_slot_bytes(cfg, warn=True) -> int:
+    need = _payload_bytes(cfg)
+    slot = cfg['mcp'].get('l2_slot_bytes') or need
+    if slot < need:
+        # a slot smaller than the payload would leave every put uncached
+        if warn:
+            print(f"[WARN] {cfg['run_id']}: mcp.l2_slot_bytes={slot} is below the {need}-byte payload; "
+                  f"sizing shm L2 slots to {need} bytes", file=sys.stderr)
+        slot = need
+    return slot
+
+def _mk_l2_groups(cfg, attach=False, lock=None):
+    mcp = cfg['mcp']
+    if mcp['strategy'] not in ('HC', 'HA'):
+        return {}
+    backend = mcp.get('l2_backend', 'local')
+    slot_bytes = _l2_slot_bytes(cfg, warn=not attach) if backend == 'shm' else None
+    groups = {}
+    for g in range(cfg['agents']['group_mod']):
+        if backend == 'shm':
+            open_l2 = SharedGroupCache.attach if attach else SharedGroupCache.create
+            groups[g] = open_l2(f"mcpb_{cfg['run_id']}_l2_{g}", mcp['l2_capacity'],
+                                slot_bytes=slot_bytes, lock=lock)
+        else:
+            groups[g] = make_cache(mcp.get('eviction', 'lru'), mcp['l2_capacity'], _weigher(cfg))
+    return groups
+
+def _close_l2_groups(l2_groups):
+    for l2 in l2_groups.values():
+        if isinstance(l2, SharedGroupCache):
+            l2.close()
+
+# prior key skew per access pattern (share of accesses to the hottest 10% of keys);
+# HA only uses it for its initial choice before measuring the live value
+ACCESS_SKEW_PRIOR = {'uniform': 0.15, 'zipf': 0.55, 'hotspot': 0.3}
+
+def _ha_initial(cfg) -> str:
+    rr = cfg['workload']['read_ratio'] if cfg['workload']['type'] != 'BU' else 0.5
+    skew = ACCESS_SKEW_PRIOR.get(cfg['access_pattern']['type'], 0.5)
+    return select(rr, skew, cfg['agents']['count'], (cfg['mcp'].get('ha') or {}).get('skew_threshold', 0.35))
+
+def _mk_controller(cfg, clock):
+    return HybridController(clock, cfg['agents']['count'], initial=_ha_initial(cfg), **(cfg['mcp'].get('ha') or {}))
+
+def _mk_strategy(name, agent_id, store, router, cfg, l2_groups=None, controller=None):
+    pd_kwargs = {'ttl_seconds': cfg['mcp']['ttl_seconds']}
+    hc_kwargs = {'group_mod': cfg['agents']['group_mod'], 'l1_capacity': cfg['mcp']['l1_capacity'],
+                 'l2_capacity': cfg['mcp']['l2_capacity'], 'eviction': cfg['mcp'].get('eviction', 'lru'),
+                 'weigher': _weigher(cfg), 'l2_groups': l2_groups}
     if name == 'PD':
-        return PullOnDemand(agent_id, store, router, ttl_seconds=cfg['mcp']['ttl_seconds'])
+        return PullOnDemand(agent_id, store, router, **pd_kwargs)
     if name == 'HC':
-        return HierarchicalCache(agent_id, store, router, group_mod=cfg['agents']['group_mod'],
-                                 l1_capacity=cfg['mcp']['l1_capacity'], l2_capacity=cfg['mcp']['l2_capacity'])
+        return HierarchicalCache(agent_id, store, router, **hc_kwargs)
     if name == 'HA':
         rr = cfg['workload']['read_ratio'] if cfg['workload']['type'] != 'BU' else 0.5
-        return HybridAdaptive(agent_id, store, router, cfg['agents']['count'], rr, access_skew=0.9)
+        return HybridAdaptive(agent_id, store, router, cfg['agents']['count'], rr,
+                              access_skew=ACCESS_SKEW_PRIOR.get(cfg['access_pattern']['type'], 0.5),
+                              controller=controller, strategy_kwargs={'PD': pd_kwargs, 'HC': hc_kwargs})
     if name == 'PS':
         return PubSub(agent_id, store, router)
     return Broadcast(agent_id, store, router)
 
-def run_experiment(cfg):
-    cfg = load_config(cfg)
-    rs = cfg['results_dir']; rid = cfg['run_id']
-    Path(rs).mkdir(parents=True, exist_ok=True)
+def _run_phase_open(clock, wl, seconds, issue, metrics):
+    # Open loop: arrival times are fixed by the schedule, never by completions.
+    # A late op still carries its intended start (coordinated-omission correction).
+    t0 = clock.time(); due = t0
+    while True:
+        due += wl.next_gap(due - t0)
+        if due - t0 >= seconds:
+            break
+        lag = due - clock.time()
+        if lag > 0:
+            clock.sleep(lag)
+        issue(wl.next_kind(), due)
+        metrics.tick()
+        if metrics.stopped:
+            return
+    clock.sleep(t0 + seconds - clock.time())
+
+def _run_phase_sim(loop, clock, wl, seconds, issue, metrics):
+    # Same open-loop schedule driven by the event queue on the virtual clock; an
+    # arrival due while a previous op still holds the clock starts late.
+    t0 = clock.time()
+
+    def arrival(due):
+        issue(wl.next_kind(), due)
+        metrics.tick()
+        if metrics.stopped:
+            return
+        nxt = due + wl.next_gap(due - t0)
+        loop.schedule(nxt, arrival, nxt)
 
-    store = ContextStore()
-    router = MessageRouter(delay_ms=cfg['mcp']['network_delay_ms'])
-    metrics = Metrics(rs, rid, cfg['measurement']['log_interval_seconds'])
+    first = t0 + wl.next_gap(0.0)
+    loop.schedule(first, arrival, first)
+    # an early stop ends the phase at the converging arrival, not at the full budget
+    loop.run_until(t0 + seconds, stop=lambda: metrics.stopped)
+    loop.clear()
 
+async def _run_phase_async(clock, wl, seconds, issue, metrics):
+    # Open loop on the event loop: each arrival becomes a task, so ops overlap while
+    # writers await network delay and deliveries are in flight.
+    t0 = clock.time(); due = t0
+    inflight = set()
+    while True:
+        due += wl.next_gap(due - t0)
+        if due - t0 >= seconds:
+            break
+        lag = due - clock.time()
+        if lag > 0:
+            await asyncio.sleep(lag)
+        t = asyncio.create_task(issue(wl.next_kind(), due))
+        inflight.add(t)
+        t.add_done_callback(inflight.discard)
+        metrics.tick()
+        if metrics.stopped:
+            break
+    if not metrics.stopped:
+        await asyncio.sleep(max(0.0, t0 + seconds - clock.time()))
+    if inflight:
+        await asyncio.gather(*inflight)
+
+# mcp.updates keys a config leaves out; keep in step with configs/default.yaml
+UPDATE_DEFAULTS = {'encoding': 'delta', 'compression': 'none', 'history': 4, 'bandwidth_mbps': 1000,
+                   'bases': 1024}
+
+def _mk_workload(cfg, ops_per_sec, seed, no_spin):
     workload = cfg['workload']['type']
     rr = cfg['workload']['read_ratio'] if workload != 'BU' else 0.5
-    wl = Workload(workload, cfg['workload']['ops_per_sec'], rr)
+    burst = cfg['workload'].get('burst') or {}
+    arrival = cfg['workload'].get('arrival', 'poisson')
+    if arrival == 'poisson' and (workload == 'BU' or burst.get('enabled')):
+        arrival = 'bursty'
+    if no_spin and arrival == 'closed':
+        arrival = 'constant'  # a closed spin loop never advances virtual time / never yields
+    scale = ops_per_sec / cfg['workload']['ops_per_sec']
+    burst_rate = burst.get('max_ops_per_sec')
+    wl = Workload(workload, ops_per_sec, rr, arrival=arrival,
+                  burst_ops_per_sec=burst_rate * scale if burst_rate else None, seed=seed)
+    return wl, arrival
+
+def _fork_siblings(siblings, agents, router, store, clock, phase, sim, seed):
+    # Each child inherits the warmed store, caches, router queues and sampler state
+    # copy-on-write, so every sibling measures from the same starting point.
+    failed = []
+    for cfg in siblings:
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                metrics = Metrics(cfg['results_dir'], cfg['run_id'], cfg['measurement']['log_interval_seconds'],
+                                  clock=clock, strategy=cfg['mcp']['strategy'])
+                metrics.watch_router(router)
+                metrics.watch_caches(lambda: _cache_stats(agents))
+                for a in agents:
+                    a.metrics = metrics
+                ctl = getattr(agents[0].strategy, 'controller', None)
+                if ctl is not None:
+                    # HA's prior comes from this sibling's workload, not the shared warmup mix
+                    ctl.reseed(_ha_initial(cfg))
+                wl, _ = _mk_workload(cfg, cfg['workload']['ops_per_sec'], seed, sim)
+                metrics.begin_measure(cfg['measurement'].get('early_stop'))
+                phase(wl, cfg['measurement']['measure_seconds'], metrics, True)
+                metrics.end_measure()
+                for a in agents:
+                    a.strategy.flush()
+                clock.sleep(cfg['measurement']['cooldown_seconds'])
+                metrics.finalize()
+                _write_manifest(cfg, agents, metrics, store)
+                _publish(cfg)
+                print("Finished", cfg['run_id'], flush=True)
+                code = 0
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                os._exit(code)
+        _, status = os.waitpid(pid, 0)
+        if status != 0:
+            failed.append(cfg['run_id'])
+    return failed
+
+def drive(cfg, clock, store, metrics, agent_ids, ops_per_sec, seed, l2_groups, siblings=None):
+    """Run init/warmup/measure/cooldown for `agent_ids` against `store`; returns the agents.
+
+    With `siblings` (configs differing only in workload), measure/cooldown run once per
+    sibling in a forked child of the warmed process instead; returns the failed run ids.
+    """
+    sim = isinstance(clock, VirtualClock)
+    use_async = cfg['measurement'].get('mode', 'wall') == 'async'
+    router_cls = AsyncMessageRouter if use_async else MessageRouter
+    upd = {**UPDATE_DEFAULTS, **(cfg['mcp'].get('updates') or {})}
+    codec = UpdateCodec(upd['encoding'], upd['compression'], upd['history'])
+    router = router_cls(delay_ms=cfg['mcp']['network_delay_ms'], clock=clock,
+                        queue_capacity=cfg['mcp'].get('queue_capacity', 1024),
+                        codec=codec, bandwidth_mbps=upd['bandwidth_mbps'], base_capacity=upd['bases'])
+    metrics.watch_router(router)
 
-    sampler = AccessSampler(n_items=10_000, kind=cfg['access_pattern']['type'],
+    wl, arrival = _mk_workload(cfg, ops_per_sec, seed, sim or use_async)
+
+    sampler = AccessSampler(n_items=cfg['context'].get('n_docs', 10_000), kind=cfg['access_pattern']['type'],
                             zipf_alpha=cfg['access_pattern'].get('zipf_alpha', 0.99),
                             hotspot_fraction=cfg['access_pattern'].get('hotspot_fraction', 0.05),
                             hotspot_share=cfg['access_pattern'].get('hotspot_share', 0.5),
-                            seed=cfg['seed'])
+                            seed=seed)
+    ids = sampler.iter_ids()
+    cid_of = store.cid  # interned by the array store; no per-op string building
+    payloads = _mk_payloads(cfg)
 
+    controller = _mk_controller(cfg, clock) if cfg['mcp']['strategy'] == 'HA' else None
     agents = []
-    for i in range(cfg['agents']['count']):
-        strat = _mk_strategy(cfg['mcp']['strategy'], i, store, router, cfg)
-        agents.append(Agent(i, strat, metrics))
+    for i in agent_ids:
+        strat = _mk_strategy(cfg['mcp']['strategy'], i, store, router, cfg, l2_groups, controller)
+        strat.set_write_policy(**(cfg['mcp'].get('writes') or {}))
+        strat.set_batching(**(cfg['mcp'].get('batch') or {}))
+        agents.append(Agent(i, strat, metrics, clock=clock))
+    metrics.watch_caches(lambda: _cache_stats(agents))
 
     # INIT
-    time.sleep(cfg['measurement']['init_seconds'])
-
-    # WARMUP
-    t0 = time.time()
-    i = 0
-    while time.time() - t0 < cfg['measurement']['warmup_seconds']:
-        count, op = wl.next_op(time.time()-t0)
-        for _ in range(count):
-            aid = i % len(agents); i += 1
-            cid = f"doc:{sampler.sample()}"
-            agents[aid].step(op, cid, payload="X")
-        metrics.tick()
+    clock.sleep(cfg['measurement']['init_seconds'])
 
-    # MEASURE
-    t0 = time.time()
-    while time.time() - t0 < cfg['measurement']['measure_seconds']:
-        count, op = wl.next_op(time.time()-t0)
-        for _ in range(count):
-            aid = int(time.time()*1000) % len(agents)
-            cid = f"doc:{sampler.sample()}"
-            agents[aid].step(op, cid, payload="X")
-        metrics.tick()
+    if use_async:
+        rr_next = [0]
+
+        async def aissue(op, intended):
+            aid = rr_next[0] % len(agents); rr_next[0] += 1
+            doc = next(ids)
+            await agents[aid].astep(op, cid_of(doc), payload=payloads(doc, op), intended=intended)
+            router.flush_due()
+
+        async def phases():
+            await _run_phase_async(clock, wl, cfg['measurement']['warmup_seconds'], aissue, metrics)
+            metrics.begin_measure(cfg['measurement'].get('early_stop'))
+            await _run_phase_async(clock, wl, cfg['measurement']['measure_seconds'], aissue, metrics)
+            metrics.end_measure()
+            for a in agents:
+                a.strategy.flush()
+
+        asyncio.run(phases())
+    else:
+        if arrival != 'closed':
+            rr_next = [0]
+
+            def issue(op, intended):
+                aid = rr_next[0] % len(agents); rr_next[0] += 1
+                doc = next(ids)
+                agents[aid].step(op, cid_of(doc), payload=payloads(doc, op), intended=intended)
+                router.flush_due()
+
+            loop = EventLoop(clock) if sim else None
+
+            def phase(wl, seconds, metrics, measuring):
+                if sim:
+                    _run_phase_sim(loop, clock, wl, seconds, issue, metrics)
+                else:
+                    _run_phase_open(clock, wl, seconds, issue, metrics)
+        else:
+            def phase(wl, seconds, metrics, measuring):
+                t0 = clock.time()
+                i = 0
+                while clock.time() - t0 < seconds:
+                    count, op = wl.next_op(clock.time()-t0)
+                    for _ in range(count):
+                        if measuring:
+                            aid = int(clock.time()*1000) % len(agents)
+                        else:
+                            aid = i % len(agents); i += 1
+                        doc = next(ids)
+                        agents[aid].step(op, cid_of(doc), payload=payloads(doc, op))
+                        router.flush_due()
+                    metrics.tick()
+                    if metrics.stopped:
+                        break
+
+        # WARMUP
+        phase(wl, cfg['measurement']['warmup_seconds'], metrics, False)
+        if siblings:
+            return _fork_siblings(siblings, agents, router, store, clock, phase, sim, seed)
+        # MEASURE
+        metrics.begin_measure(cfg['measurement'].get('early_stop'))
+        phase(wl, cfg['measurement']['measure_seconds'], metrics, True)
+        metrics.end_measure()
+
+    for a in agents:
+        a.strategy.flush()
 
     # COOLDOWN
-    time.sleep(cfg['measurement']['cooldown_seconds'])
+    clock.sleep(cfg['measurement']['cooldown_seconds'])
+    return agents
+
+def _run_stats(agents, metrics) -> dict:
+    """Manifest fields owned by one process's agents and Metrics (parallel.py merges them across workers)."""
+    return {"cache_stats":metrics.cache_stats(), "router_stats":metrics.router_stats(),
+            "ha_switches":_ha_switches(agents), "measure":metrics.measure_summary()}
+
+def _dump_manifest(cfg, stats: dict, payload: dict):
+    with open(Path(cfg['results_dir'])/"agg"/f"{cfg['run_id']}.manifest.json","w") as f:
+        json.dump({"cfg":cfg, **stats, "payload":payload}, f)
+
+def _write_manifest(cfg, agents, metrics, store):
+    _dump_manifest(cfg, _run_stats(agents, metrics),
+                   {"resident_bytes":store.payload_bytes, "bytes_written":store.bytes_written})
 
-    metrics.finalize()
-    with open(Path(rs)/"agg"/f"{rid}.manifest.json","w") as f:
-        json.dump({"cfg":cfg}, f)
+def _publish(cfg):
+    if cfg.get('dataset', True):
+        publish_run(cfg['results_dir'], cfg['run_id'])
+
+def run_experiment(cfg):
+    cfg = load_config(cfg)
+    _check_capacities(cfg)
+    rs = cfg['results_dir']; rid = cfg['run_id']
+    Path(rs).mkdir(parents=True, exist_ok=True)
+
+    ex = cfg.get('execution') or {}
+    if ex.get('workers', 1) > 1 or ex.get('store_shards', 1) > 1:
+        from .parallel import run_parallel
+        return run_parallel(cfg)
+
+    sim = cfg['measurement'].get('mode', 'wall') == 'sim'
+    clock = VirtualClock() if sim else WallClock()
+
+    store = _mk_store(cfg, clock)
+    metrics = Metrics(rs, rid, cfg['measurement']['log_interval_seconds'], clock=clock,
+                      strategy=cfg['mcp']['strategy'])
+    l2_groups = _mk_l2_groups(cfg)
+    try:
+        agents = drive(cfg, clock, store, metrics, range(cfg['agents']['count']),
+                       cfg['workload']['ops_per_sec'], cfg['seed'], l2_groups)
+        metrics.finalize()
+        _write_manifest(cfg, agents, metrics, store)
+    finally:
+        # shared-memory L2 segments outlive the process otherwise, and a retry of this run_id reuses their names
+        _close_l2_groups(l2_groups)
+    _publish(cfg)
     print("Finished", rid)
+
+WARM_WORKLOAD = {'type': 'BA', 'read_ratio': 0.5}  # neutral mix shared by every sibling's warmup
+
+def warm_key(cfg) -> str:
+    """Configs with equal keys differ only in workload mix/rate and measure/cooldown, so
+    they can share one init + warmup (see run_family)."""
+    c = copy.deepcopy(load_config(cfg))
+    for k in ('run_id', 'results_dir'):
+        c.pop(k, None)
+    wl = c.pop('workload', {})
+    c['arrival'] = 'closed' if wl.get('arrival') == 'closed' else 'open'
+    c['measurement'] = {k: v for k, v in c['measurement'].items()
+                        if k not in ('measure_seconds', 'cooldown_seconds', 'early_stop')}
+    return hashlib.sha1(json.dumps(c, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+def can_fork(cfg) -> bool:
+    ex = cfg.get('execution') or {}
+    return (hasattr(os, 'fork') and cfg['measurement'].get('mode', 'wall') != 'async'
+            and ex.get('workers', 1) <= 1 and ex.get('store_shards', 1) <= 1
+            and cfg['mcp'].get('l2_backend', 'local') != 'shm')
+
+def run_family(cfgs):
+    """Run sibling configs (equal warm_key) from one warmed process.
+
+    Init and warmup run once under WARM_WORKLOAD at the first sibling's rate; each sibling
+    then forks from the warmed state for its own measure/cooldown. Configs that cannot
+    fork (async mode, multi-process, shared-memory L2) run independently.
+    """
+    cfgs = [load_config(c) for c in cfgs]
+    for c in cfgs:
+        _check_capacities(c)
+    if len(cfgs) == 1 or not all(can_fork(c) for c in cfgs):
+        for c in cfgs:
+            run_experiment(c)
+        return
+    base = copy.deepcopy(cfgs[0])
+    base['workload'] = {**base['workload'], **WARM_WORKLOAD}
+    sim = base['measurement'].get('mode', 'wall') == 'sim'
+    clock = VirtualClock() if sim else WallClock()
+    for c in cfgs:
+        (Path(c['results_dir'])/"agg").mkdir(parents=True, exist_ok=True)
+    store = _mk_store(base, clock)
+    scratch = tempfile.mkdtemp(prefix='mcpbench-warm-')
+    try:
+        # the scratch recorder absorbs warmup ops; sibling parquets hold their measure/cooldown ops
+        metrics = Metrics(scratch, 'warmup', base['measurement']['log_interval_seconds'], clock=clock,
+                          strategy=base['mcp']['strategy'])
+        l2_groups = _mk_l2_groups(base)
+        failed = drive(base, clock, store, metrics, range(base['agents']['count']),
+                       base['workload']['ops_per_sec'], base['seed'], l2_groups, siblings=cfgs)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    if failed:
+        raise RuntimeError(f"sibling runs failed: {', '.join(failed)}")
@@ -0,0 +1,99 @@
+import bisect, hashlib
+from multiprocessing.connection import wait
+from .clock import WallClock
+from .context_store import ContextStore, ArrayContextStore
+
+def _h64(s: str) -> int:
+    return int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), 'little')
+
+class HashRing:
+    """Consistent hashing of cids onto shards, with virtual nodes for balance."""
+    def __init__(self, n_shards: int, vnodes: int = 64):
+        points = sorted((_h64(f"shard{s}#{v}"), s) for s in range(n_shards) for v in range(vnodes))
+        self._keys = [k for k, _ in points]
+        self._shards = [s for _, s in points]
+        self._memo = {}
+
+    def shard(self, cid: str) -> int:
+        s = self._memo.get(cid)
+        if s is None:
+            i = bisect.bisect(self._keys, _h64(cid)) % len(self._keys)
+            s = self._memo[cid] = self._shards[i]
+        return s
+
+def serve_shard(conns, out_q=None, key=None, store_kind: str = 'dict', n_docs: int = 10_000):
+    """Store-process loop: one ContextStore (ArrayContextStore for store_kind 'array') answering
+    read/write/CAS requests from every worker pipe. Once every worker has finished, the shard's
+    payload byte counts go to `out_q` under `key`."""
+    if store_kind == 'array':
+        store = ArrayContextStore(n_docs, lock_stripes=1)
+    else:
+        store = ContextStore(lock_stripes=1)
+    live = list(conns)
+    while live:
+        for c in wait(live):
+            try:
+                msg = c.recv()
+            except EOFError:
+                live.remove(c); continue
+            if msg[0] == 'r':
+                c.send(store.read(msg[1]))
+            elif msg[0] == 'v':
+                c.send(store.latest(msg[1]))
+            elif msg[0] == 'w':
+                c.send(store.write(msg[1], msg[2]))
+            elif msg[0] == 'c':  # single-threaded loop: the compare-and-swap is atomic per shard
+                c.send(store.write_if_version(msg[1], msg[2], msg[3]))
+            else:  # 'q': worker finished
+                live.remove(c)
+                c.close()
+    if out_q is not None:
+        out_q.put((key, {'resident_bytes': store.payload_bytes, 'bytes_written': store.bytes_written}))
+
+class ShardedContextStore:
+    """ContextStore facade for a worker process; each shard is a store process behind a Pipe.
+
+    A shard's read reply is that shard's current item, so it also answers latest() for the cid;
+    the next latest() call for the same cid reuses it instead of a second round trip."""
+    def __init__(self, conns, vnodes: int = 64, clock=None):
+        self.clock = clock or WallClock()
+        self.conns = list(conns)
+        self.ring = HashRing(len(self.conns), vnodes)
+        self._fresh = None  # (cid, (version, updated_at)) from the last store read, consumed by latest()
+
+    def cid(self, doc: int) -> str:
+        return f"doc:{doc}"
+
+    def read(self, cid: str):
+        c = self.conns[self.ring.shard(cid)]
+        c.send(('r', cid))
+        item = c.recv()
+        self._fresh = (cid, (item.version, item.updated_at) if item is not None else (0, 0.0))
+        return item
+
+    def latest(self, cid: str):
+        fresh, self._fresh = self._fresh, None
+        if fresh is not None and fresh[0] == cid:
+            return fresh[1]
+        # a cache hit never reached the store: one small round trip to the owning shard
+        c = self.conns[self.ring.shard(cid)]
+        c.send(('v', cid))
+        return c.recv()
+
+    def write(self, cid: str, data):
+        self._fresh = None
+        c = self.conns[self.ring.shard(cid)]
+        # memoryview slices of the mmap corpus cannot be pickled; pipes copy anyway
+        c.send(('w', cid, data if isinstance(data, (str, bytes)) else bytes(data)))
+        return c.recv()
+
+    def write_if_version(self, cid: str, expected: int, data):
+        self._fresh = None
+        c = self.conns[self.ring.shard(cid)]
+        c.send(('c', cid, expected, data if isinstance(data, (str, bytes)) else bytes(data)))
+        return c.recv()
+
+    def close(self):
+        for c in self.conns:
+            c.send(('q',))
+            c.close()
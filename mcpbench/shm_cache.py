@@ -0,0 +1,171 @@
+import hashlib, multiprocessing, time
+from contextlib import nullcontext
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+from .context_store import ContextItem
+
+KEY_BYTES = 64
+WAYS = 8
+
+def _slot_dtype(slot_bytes: int) -> np.dtype:
+    return np.dtype([
+        ('seq', np.uint64),       # seqlock: odd while a writer is inside the slot
+        ('key_hash', np.uint64),  # 0 = empty
+        ('version', np.int64),
+        ('updated_at', np.float64),
+        ('tick', np.int64),       # last access (CLOCK_MONOTONIC ns, comparable across processes)
+        ('key_len', np.uint16),
+        ('is_bytes', np.uint8),
+        ('data_len', np.uint32),
+        ('key', np.uint8, (KEY_BYTES,)),
+        ('data', np.uint8, (slot_bytes,)),
+    ], align=True)
+
+def _hash(key: str) -> int:
+    # process-independent (str hash() is salted per interpreter); never 0
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little') | 1
+
+class SharedGroupCache:
+    """Group cache in a SharedMemory segment: 8-way set-associative slots with LRU-by-tick
+    replacement, per-slot seqlocks for lock-free readers and version stamps so an older
+    item never overwrites a newer one. Writers from several processes must share `lock`
+    (e.g. a multiprocessing.Lock inherited at fork). Stats are local to this handle.
+    """
+    def __init__(self, shm: shared_memory.SharedMemory, slots: int, slot_bytes: int, owner: bool, lock=None):
+        self.shm = shm
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.owner = owner
+        self.capacity = slots
+        self._lock = lock if lock is not None else nullcontext()
+        self.tab = np.ndarray((slots,), dtype=_slot_dtype(slot_bytes), buffer=shm.buf)
+        self.nsets = slots // WAYS
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.oversize = 0
+
+    @classmethod
+    def create(cls, name: str, capacity: int, slot_bytes: int = 1024, lock=None) -> 'SharedGroupCache':
+        slots = max(WAYS, -(-capacity // WAYS) * WAYS)
+        size = _slot_dtype(slot_bytes).itemsize * slots
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # left behind by a crashed attempt of the same run (names are per run_id): reclaim it
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        shm.buf[:size] = bytes(size)
+        return cls(shm, slots, slot_bytes, owner=True, lock=lock)
+
+    @classmethod
+    def attach(cls, name: str, capacity: int, slot_bytes: int = 1024, lock=None) -> 'SharedGroupCache':
+        shm = shared_memory.SharedMemory(name=name)
+        # The creator owns unlinking. multiprocessing children share the creator's resource
+        # tracker (which already holds the name); an unrelated process has its own tracker
+        # that would unlink the segment at exit unless told not to.
+        if multiprocessing.parent_process() is None:
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return cls(shm, max(WAYS, -(-capacity // WAYS) * WAYS), slot_bytes, owner=False, lock=lock)
+
+    def __len__(self):
+        return int(np.count_nonzero(self.tab['key_hash']))
+
+    @property
+    def weight(self):
+        return len(self)
+
+    def _ways(self, h: int) -> range:
+        base = (h % self.nsets) * WAYS
+        return range(base, base + WAYS)
+
+    def _read(self, i: int):
+        tab = self.tab
+        while True:
+            s = int(tab['seq'][i])
+            if s & 1:
+                continue
+            rec = tab[i].copy()
+            if int(tab['seq'][i]) == s:
+                return rec
+
+    def _match(self, rec, h: int, kb: bytes) -> bool:
+        return int(rec['key_hash']) == h and bytes(rec['key'][:int(rec['key_len'])]) == kb
+
+    def _item(self, key, rec) -> ContextItem:
+        raw = bytes(rec['data'][:int(rec['data_len'])])
+        data = raw if rec['is_bytes'] else raw.decode()
+        return ContextItem(id=key, version=int(rec['version']), data=data, updated_at=float(rec['updated_at']))
+
+    def get(self, key):
+        h = _hash(key); kb = key.encode()
+        for i in self._ways(h):
+            if int(self.tab['key_hash'][i]) != h:
+                continue
+            rec = self._read(i)
+            if self._match(rec, h, kb):
+                self.tab['tick'][i] = time.monotonic_ns()
+                self.hits += 1
+                return self._item(key, rec)
+        self.misses += 1
+        return None
+
+    def put(self, key, item):
+        h = _hash(key); kb = key.encode()
+        is_bytes = not isinstance(item.data, str)
+        db = bytes(item.data) if is_bytes else item.data.encode()
+        if len(kb) > KEY_BYTES or len(db) > self.slot_bytes:
+            self.oversize += 1  # does not fit a slot; left uncached, but counted
+            return
+        tab = self.tab
+        with self._lock:
+            target = None
+            for i in self._ways(h):
+                if self._match(tab[i], h, kb):
+                    if int(tab['version'][i]) > item.version:
+                        return
+                    target = i
+                    break
+            if target is None:
+                ways = self._ways(h)
+                empty = [i for i in ways if int(tab['key_hash'][i]) == 0]
+                if empty:
+                    target = empty[0]
+                else:
+                    target = min(ways, key=lambda i: int(tab['tick'][i]))
+                    self.evictions += 1
+            tab['seq'][target] += 1
+            tab['key_hash'][target] = h
+            tab['version'][target] = item.version
+            tab['updated_at'][target] = item.updated_at
+            tab['tick'][target] = time.monotonic_ns()
+            tab['key_len'][target] = len(kb)
+            tab['is_bytes'][target] = is_bytes
+            tab['data_len'][target] = len(db)
+            tab['key'][target][:len(kb)] = np.frombuffer(kb, dtype=np.uint8)
+            tab['data'][target][:len(db)] = np.frombuffer(db, dtype=np.uint8)
+            tab['seq'][target] += 1
+
+    def pop(self, key, default=None):
+        h = _hash(key); kb = key.encode()
+        with self._lock:
+            for i in self._ways(h):
+                rec = self.tab[i].copy()
+                if self._match(rec, h, kb):
+                    self.tab['seq'][i] += 1
+                    self.tab['key_hash'][i] = 0
+                    self.tab['seq'][i] += 1
+                    return self._item(key, rec)
+        return default
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'entries': len(self), 'weight': len(self), 'capacity': self.capacity, 'oversize': self.oversize}
+
+    def close(self):
+        self.tab = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
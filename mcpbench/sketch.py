@@ -0,0 +1,88 @@
+import math
+import numpy as np
+
+class LogHistogram:
+    """Mergeable log-bucketed histogram with bounded relative error (HDR/DDSketch style).
+
+    Bucket 0 holds values below min_value (reported as 0); bucket k+1 holds
+    (min_value*g^(k-1), min_value*g^k] with g = (1+rel_err)/(1-rel_err).
+    """
+    def __init__(self, min_value: float = 1e-3, max_value: float = 1e7, rel_err: float = 0.01):
+        self.min_value = min_value
+        self.max_value = max_value
+        self.rel_err = rel_err
+        self.gamma = (1 + rel_err) / (1 - rel_err)
+        self._log_gamma = math.log(self.gamma)
+        self.n_buckets = int(math.ceil(math.log(max_value / min_value) / self._log_gamma)) + 2
+        self.counts = np.zeros(self.n_buckets, dtype=np.int64)
+        self.total = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _index(self, values: np.ndarray) -> np.ndarray:
+        idx = np.zeros(values.shape, dtype=np.int64)
+        pos = values >= self.min_value
+        k = np.ceil(np.log(values[pos] / self.min_value) / self._log_gamma).astype(np.int64)
+        idx[pos] = np.minimum(k + 1, self.n_buckets - 1)
+        return idx
+
+    def bucket_values(self) -> np.ndarray:
+        k = np.arange(self.n_buckets, dtype=np.float64) - 1
+        vals = 2 * self.min_value * self.gamma**k / (self.gamma + 1)
+        vals[0] = 0.0
+        return vals
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if not values.size:
+            return
+        self.counts += np.bincount(self._index(values), minlength=self.n_buckets)
+        self.total += int(values.size)
+        self.sum += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def merge(self, other: 'LogHistogram') -> 'LogHistogram':
+        if (other.min_value, other.max_value, other.rel_err) != (self.min_value, self.max_value, self.rel_err):
+            raise ValueError("cannot merge histograms with different bucket layouts")
+        self.counts += other.counts
+        self.total += other.total
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def mean(self) -> float:
+        return self.sum / self.total if self.total else float('nan')
+
+    def quantile(self, q: float) -> float:
+        if not self.total:
+            return float('nan')
+        cum = np.cumsum(self.counts)
+        i = int(np.searchsorted(cum, q * (self.total - 1), side='right'))
+        v = float(self.bucket_values()[min(i, self.n_buckets - 1)])
+        return min(max(v, self.min), self.max)
+
+    def cdf(self):
+        nz = np.flatnonzero(self.counts)
+        return self.bucket_values()[nz], np.cumsum(self.counts[nz]) / max(1, self.total)
+
+    def to_dict(self) -> dict:
+        nz = np.flatnonzero(self.counts)
+        return {
+            'min_value': self.min_value, 'max_value': self.max_value, 'rel_err': self.rel_err,
+            'total': self.total, 'sum': self.sum,
+            'min': self.min if self.total else None, 'max': self.max if self.total else None,
+            'idx': nz.tolist(), 'counts': self.counts[nz].tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> 'LogHistogram':
+        h = cls(d['min_value'], d['max_value'], d['rel_err'])
+        h.counts[np.asarray(d['idx'], dtype=np.int64)] = np.asarray(d['counts'], dtype=np.int64)
+        h.total = int(d['total'])
+        h.sum = float(d['sum'])
+        h.min = math.inf if d['min'] is None else float(d['min'])
+        h.max = -math.inf if d['max'] is None else float(d['max'])
+        return h
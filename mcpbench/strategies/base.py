@@ -1,16 +1,163 @@
+import asyncio, random
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import Dict, Optional
 from ..context_store import ContextStore, ContextItem
 from ..message_router import MessageRouter
+from ..utils import sleep_ms
 
 class Strategy(ABC):
-    def __init__(self, agent_id: int, store: ContextStore, router: MessageRouter):
+    # write policy: 'cas' commits against the version this agent last saw and retries
+    # conflicts with jittered exponential backoff; 'blind' is last-writer-wins
+    write_policy = 'cas'
+    max_retries = 3
+    backoff_ms = 1.0
+    # update fan-out batching (BC/PS): a window closes after batch_window_ms or at batch_max
+    # distinct cids, whichever comes first (0 disables that bound); batch_max 1 sends on commit
+    batch_window_ms = 0.0
+    batch_max = 1
+
+    def __init__(self, agent_id: int, store: ContextStore, router: MessageRouter, clock=None):
         self.agent_id = agent_id
         self.store = store
         self.router = router
+        self.clock = clock or store.clock
+        self.seen: Dict[str, int] = {}  # cid -> last version this agent read or wrote
+        self.last_conflict = False
+        self.last_retries = 0
+        self._rng = random.Random(agent_id)
+        self._pending: Dict[str, ContextItem] = {}  # cid -> newest committed item awaiting fan-out
+        self._pending_since = 0.0
+        router.register(agent_id)
+
+    def set_write_policy(self, policy: str = 'cas', max_retries: int = 3, backoff_ms: float = 1.0):
+        self.write_policy, self.max_retries, self.backoff_ms = policy, max_retries, backoff_ms
+
+    def set_batching(self, window_ms: float = 0.0, max_updates: int = 1):
+        self.batch_window_ms, self.batch_max = window_ms, max_updates
+
+    def _pend(self, cid: str, item: ContextItem):
+        if not self._pending:
+            self._pending_since = self.clock.time()
+            self.router.pending_senders[self.agent_id] = self
+        elif cid in self._pending:
+            self.router.batch_collapsed += 1
+        self._pending[cid] = item
+
+    def _batch_due(self) -> bool:
+        if not self._pending:
+            return False
+        if self.batch_max and len(self._pending) >= self.batch_max:
+            return True
+        if self.batch_window_ms:
+            return (self.clock.time() - self._pending_since)*1000.0 >= self.batch_window_ms
+        return not self.batch_max
+
+    def _send(self, updates: list):
+        """Ship one window's updates (one message per recipient); strategies that fan out override."""
+
+    def flush(self) -> int:
+        if not self._pending:
+            return 0
+        updates = [{'type':'update','cid':cid,'version':it.version,'data':it.data} for cid, it in self._pending.items()]
+        self._pending.clear()
+        self.router.pending_senders.pop(self.agent_id, None)
+        self._send(updates)
+        return len(updates)
+
+    def flush_if_due(self):
+        if self._batch_due():
+            self.flush()
+
+    def note_read(self, cid: str, version: int):
+        """Record the version a read returned; the next CAS write to cid commits against it."""
+        self.seen[cid] = version
+
+    def _cas(self, cid: str, data) -> tuple[bool, Optional[ContextItem]]:
+        if self.write_policy == 'blind':
+            return True, self.store.write(cid, data)
+        expected = self.seen.get(cid)
+        if expected is None:  # never observed: commit against whatever is current
+            cur = self.store.read(cid)
+            expected = cur.version if cur else 0
+        return self.store.write_if_version(cid, expected, data)
+
+    def _settle(self, cid: str, ok: bool, item: Optional[ContextItem], retries: int) -> Optional[float]:
+        """Record a CAS outcome after `retries` retries; returns the backoff (ms) before the next
+        retry, or None when done."""
+        self.seen[cid] = item.version if item else 0
+        if ok or retries >= self.max_retries:
+            return None
+        return self._rng.uniform(0, self.backoff_ms * (1 << retries))
+
+    def _commit(self, cid: str, data) -> Optional[ContextItem]:
+        """Optimistic write; the committed item, or None once retries are exhausted.
+        The outcome is left in last_conflict/last_retries for the synchronous caller."""
+        retries = 0
+        while True:
+            ok, item = self._cas(cid, data)
+            wait = self._settle(cid, ok, item, retries)
+            if wait is None:
+                self.last_conflict, self.last_retries = retries > 0 or not ok, retries
+                return item if ok else None
+            retries += 1
+            sleep_ms(wait, self.clock)
+
+    async def _acommit(self, cid: str, data) -> tuple[Optional[ContextItem], bool, int]:
+        """(committed item or None, conflict, retries); returned rather than stored on the strategy,
+        since overlapping ops of one agent would overwrite each other's outcome."""
+        retries = 0
+        while True:
+            ok, item = self._cas(cid, data)
+            wait = self._settle(cid, ok, item, retries)
+            if wait is None:
+                return (item if ok else None), retries > 0 or not ok, retries
+            retries += 1
+            await asyncio.sleep(wait/1000.0)
+
     @abstractmethod
-    def read(self, cid: str) -> tuple[Optional[ContextItem], float]:
+    def read(self, cid: str) -> Optional[ContextItem]:
         ...
-    @abstractmethod
+
+    def staleness(self, cid: str, item: Optional[ContextItem]) -> tuple[int, float]:
+        """(versions behind, ms behind) of a read against the store's latest version of cid.
+
+        ms behind counts from the commit of the latest version, a lower bound on how long the
+        copy has been out of date when several versions were missed.
+        """
+        if item is None:
+            return 0, 0.0
+        latest, updated_at = self.store.latest(cid)
+        behind = latest - item.version
+        return (behind, (self.clock.time() - updated_at)*1000.0) if behind > 0 else (0, 0.0)
     def write(self, cid: str, data: str) -> bool:
-        ...
+        item = self._commit(cid, data)
+        if item is not None:
+            self.on_commit(cid, item)
+        return item is not None
+
+    def on_commit(self, cid: str, item: ContextItem):
+        """Propagate a committed write (notify peers, invalidate caches)."""
+    def cache_tiers(self) -> dict:
+        return {}
+
+    def lookup_hits(self) -> int:
+        return sum(c.hits for c in self.cache_tiers().values())
+
+    def export_warm(self) -> list:
+        """(cid, item) pairs worth handing to a successor strategy, coldest first."""
+        return []
+
+    def import_warm(self, entries: list):
+        pass
+
+    # Coroutine counterparts for the asyncio runner; strategies that wait on the
+    # network override these to await instead of sleeping the thread.
+    async def aread(self, cid: str) -> Optional[ContextItem]:
+        return self.read(cid)
+
+    async def awrite(self, cid: str, data: str) -> tuple[Optional[ContextItem], bool, int]:
+        """(committed item or None, conflict, retries) of this write."""
+        item, conflict, retries = await self._acommit(cid, data)
+        if item is not None:
+            self.on_commit(cid, item)
+        return item, conflict, retries
@@ -1,14 +1,28 @@
+import asyncio
 from .base import Strategy
 from ..utils import sleep_ms
 
 class Broadcast(Strategy):
     def read(self, cid: str):
-        item = self.store.read(cid)
-        stale_ms = 0.0 if item else 0.0
-        return item, stale_ms
+        self.router.poll_all(self.agent_id)
+        return self.store.read(cid)
+
+    def on_commit(self, cid: str, item):
+        self._pend(cid, item)
+
+    def _send(self, updates):
+        self.router.broadcast_many(self.agent_id, updates)
 
     def write(self, cid: str, data: str) -> bool:
-        item = self.store.write(cid, data)
-        self.router.broadcast(self.agent_id, {'type':'update','cid':cid,'version':item.version})
-        sleep_ms(self.router.delay_ms)
-        return True
+        ok = super().write(cid, data)
+        if self._batch_due():
+            self.flush()
+            sleep_ms(self.router.delay_ms, self.clock)
+        return ok
+
+    async def awrite(self, cid: str, data: str):
+        res = await super().awrite(cid, data)
+        if self._batch_due():
+            self.flush()
+            await asyncio.sleep(self.router.delay_ms/1000.0)
+        return res
@@ -1,47 +1,52 @@
-import time
 from .base import Strategy
+from ..cache import make_cache
 
 class HierarchicalCache(Strategy):
     L2_groups = {}
 
-    def __init__(self, agent_id, store, router, group_mod=5, l1_capacity=100, l2_capacity=1000):
+    def __init__(self, agent_id, store, router, group_mod=5, l1_capacity=100, l2_capacity=1000,
+                 eviction='lru', weigher=None, l2_groups=None):
         super().__init__(agent_id, store, router)
         self.group = agent_id % group_mod
-        if self.group not in HierarchicalCache.L2_groups:
-            HierarchicalCache.L2_groups[self.group] = {}
-        self.L1 = {}
+        # per-run group caches (local or shared-memory) come from the runner; the
+        # class-level dict remains the fallback for standalone construction
+        self.l2_groups = HierarchicalCache.L2_groups if l2_groups is None else l2_groups
+        if self.group not in self.l2_groups:
+            self.l2_groups[self.group] = make_cache(eviction, l2_capacity, weigher)
+        self.L1 = make_cache(eviction, l1_capacity, weigher)
         self.l1_capacity = l1_capacity
         self.l2_capacity = l2_capacity
 
     def _l2(self):
-        return HierarchicalCache.L2_groups[self.group]
+        return self.l2_groups[self.group]
 
     def _promote(self, cid, item):
-        self.L1[cid] = (item, time.time())
-        if len(self.L1) > self.l1_capacity:
-            self.L1.pop(next(iter(self.L1)))
-        l2 = self._l2()
-        l2[cid] = (item, time.time())
-        if len(l2) > self.l2_capacity:
-            l2.pop(next(iter(l2)))
+        self.L1.put(cid, item)
+        self._l2().put(cid, item)
+
+    def cache_tiers(self):
+        return {'l1': self.L1, 'l2': self._l2()}
+
+    def export_warm(self):
+        return list(self.L1.items())
+
+    def import_warm(self, entries):
+        for cid, item in entries[-self.l1_capacity:]:
+            self.L1.put(cid, item)
 
     def read(self, cid: str):
-        now = time.time()
-        if cid in self.L1:
-            item = self.L1[cid][0]
-            return item, (now - item.updated_at)*1000.0 if item else 0.0
-        l2 = self._l2()
-        if cid in l2:
-            item = l2[cid][0]
-            self._promote(cid, item)
-            return item, (now - item.updated_at)*1000.0 if item else 0.0
+        item = self.L1.get(cid)
+        if item is not None:
+            return item
+        item = self._l2().get(cid)
+        if item is not None:
+            self.L1.put(cid, item)
+            return item
         item = self.store.read(cid)
         if item:
             self._promote(cid, item)
-        return item, (now - item.updated_at)*1000.0 if item else 0.0
+        return item
 
-    def write(self, cid: str, data: str) -> bool:
-        item = self.store.write(cid, data)
+    def on_commit(self, cid: str, item):
         self.L1.pop(cid, None)
         self._l2().pop(cid, None)
-        return True
@@ -1,39 +1,191 @@
-import time
+import math
+from collections import Counter, deque
 from .base import Strategy
 from .broadcast import Broadcast
 from .pubsub import PubSub
 from .pull_on_demand import PullOnDemand
 from .hierarchical_cache import HierarchicalCache
 
+STRATEGIES = {'BC': Broadcast, 'PS': PubSub, 'PD': PullOnDemand, 'HC': HierarchicalCache}
+
+def select(read_ratio: float, skew: float, agent_count: int, skew_threshold: float = 0.35, margin: float = 0.0,
+           current: str = None) -> str:
+    # margin widens the band of whichever strategy is current (hysteresis)
+    def m(kind):
+        return margin if kind == current else 0.0
+    if read_ratio <= 0.3 + m('PS'):
+        return 'PS'
+    if read_ratio > 0.7 - m('BC') and agent_count <= 25:
+        return 'BC'
+    if read_ratio > 0.7 - m('HC') and skew > skew_threshold - m('HC'):
+        return 'HC'
+    if agent_count > 50:
+        return 'PS'
+    return 'PD'
+
+class HybridController:
+    """Sliding-window feedback controller shared by all HA agents of a run.
+
+    Every eval_seconds it measures read ratio, key skew (share of accesses going to the
+    hottest 10% of keys in the window), cache hit rate and p95 latency, and proposes a
+    strategy. A switch needs `confirm` consecutive identical proposals, min_dwell_seconds
+    since the last switch, and threshold margins that favour the current strategy; the
+    margin doubles while the current strategy meets its p95 SLO and hit-rate floor.
+    """
+    def __init__(self, clock, agent_count: int, initial: str = 'BC', window_seconds: float = 30.0,
+                 eval_seconds: float = 5.0, min_dwell_seconds: float = 30.0, confirm: int = 2,
+                 hysteresis: float = 0.05, skew_threshold: float = 0.35, p95_slo_ms: float = 50.0,
+                 min_hit_rate: float = 0.2):
+        self.clock = clock
+        self.agent_count = agent_count
+        self.kind = initial
+        self.window_seconds = window_seconds
+        self.eval_seconds = eval_seconds
+        self.min_dwell_seconds = min_dwell_seconds
+        self.confirm = confirm
+        self.hysteresis = hysteresis
+        self.skew_threshold = skew_threshold
+        self.p95_slo_ms = p95_slo_ms
+        self.min_hit_rate = min_hit_rate
+        self.ops = deque()  # (t, is_read, cid, latency_ms, hit or None)
+        self.last_switch = self.last_eval = clock.time()
+        self._proposal, self._streak = None, 0
+        self.history = []
+
+    def reseed(self, kind: str):
+        """Restart from `kind` with an empty window, e.g. when a forked run measures a different
+        workload than the shared warmup; agents hand over to it on their next op."""
+        now = self.clock.time()
+        if kind != self.kind:
+            self.history.append({'t': now, 'from': self.kind, 'to': kind, 'reseed': True})
+        self.kind = kind
+        self.ops.clear()
+        self.last_switch = self.last_eval = now
+        self._proposal, self._streak = None, 0
+
+    def observe(self, t: float, is_read: bool, cid: str, latency_ms: float, hit=None):
+        self.ops.append((t, is_read, cid, latency_ms, hit))
+
+    def measure(self) -> dict:
+        horizon = self.clock.time() - self.window_seconds
+        while self.ops and self.ops[0][0] < horizon:
+            self.ops.popleft()
+        n = len(self.ops)
+        if not n:
+            return {}
+        reads = sum(1 for o in self.ops if o[1])
+        counts = sorted(Counter(o[2] for o in self.ops).values(), reverse=True)
+        top = max(1, math.ceil(len(counts) * 0.1))
+        lookups = [o[4] for o in self.ops if o[4] is not None]
+        lat = sorted(o[3] for o in self.ops)
+        return {'read_ratio': reads / n, 'skew': sum(counts[:top]) / n,
+                'hit_rate': sum(lookups) / len(lookups) if lookups else None,
+                'p95_ms': lat[min(n - 1, int(0.95 * n))], 'ops': n}
+
+    def choice(self) -> str:
+        now = self.clock.time()
+        if now - self.last_eval < self.eval_seconds:
+            return self.kind
+        self.last_eval = now
+        m = self.measure()
+        if not m:
+            return self.kind
+        healthy = m['p95_ms'] <= self.p95_slo_ms and (m['hit_rate'] is None or m['hit_rate'] >= self.min_hit_rate)
+        margin = self.hysteresis * (2 if healthy else 1)
+        proposal = select(m['read_ratio'], m['skew'], self.agent_count, self.skew_threshold, margin, self.kind)
+        if proposal == self.kind:
+            self._proposal, self._streak = None, 0
+            return self.kind
+        self._streak = self._streak + 1 if proposal == self._proposal else 1
+        self._proposal = proposal
+        if self._streak >= self.confirm and now - self.last_switch >= self.min_dwell_seconds:
+            self.history.append({'t': now, 'from': self.kind, 'to': proposal, **m})
+            self.kind, self.last_switch = proposal, now
+            self._proposal, self._streak = None, 0
+        return self.kind
+
 class HybridAdaptive(Strategy):
-    def __init__(self, agent_id, store, router, agent_count: int, read_ratio: float, access_skew: float=0.8):
+    def __init__(self, agent_id, store, router, agent_count: int, read_ratio: float, access_skew: float=0.8,
+                 controller: HybridController=None, strategy_kwargs: dict=None):
         super().__init__(agent_id, store, router)
-        self.cur = Broadcast(agent_id, store, router)
         self.agent_count = agent_count
         self.read_ratio = read_ratio
         self.access_skew = access_skew
-        self.last_switch = time.time()
+        # configured read_ratio/access_skew only seed the initial choice; the controller
+        # then switches on what it observes
+        self.controller = controller or HybridController(self.clock, agent_count, initial=self._select())
+        self.strategy_kwargs = strategy_kwargs or {}
+        self._pool = {}
+        self.kind = self.controller.kind
+        self.cur = self._get(self.kind)
 
     def _select(self):
-        if self.read_ratio <= 0.3:
-            return PubSub(self.agent_id, self.store, self.router)
-        if self.read_ratio > 0.7 and self.agent_count <= 25:
-            return Broadcast(self.agent_id, self.store, self.router)
-        if self.read_ratio > 0.7 and self.access_skew > 0.8:
-            return HierarchicalCache(self.agent_id, self.store, self.router)
-        if self.agent_count > 50:
-            return PubSub(self.agent_id, self.store, self.router)
-        return PullOnDemand(self.agent_id, self.store, self.router)
+        return select(self.read_ratio, self.access_skew, self.agent_count)
+
+    def _get(self, kind):
+        s = self._pool.get(kind)
+        if s is None:
+            s = self._pool[kind] = STRATEGIES[kind](self.agent_id, self.store, self.router,
+                                                    **self.strategy_kwargs.get(kind, {}))
+            s.seen = self.seen  # one view of observed versions across the pool
+            s.set_write_policy(self.write_policy, self.max_retries, self.backoff_ms)
+            s.set_batching(self.batch_window_ms, self.batch_max)
+        return s
+
+    def set_write_policy(self, policy: str = 'cas', max_retries: int = 3, backoff_ms: float = 1.0):
+        super().set_write_policy(policy, max_retries, backoff_ms)
+        for s in self._pool.values():
+            s.set_write_policy(policy, max_retries, backoff_ms)
+
+    def set_batching(self, window_ms: float = 0.0, max_updates: int = 1):
+        super().set_batching(window_ms, max_updates)
+        for s in self._pool.values():
+            s.set_batching(window_ms, max_updates)
+
+    def flush(self) -> int:
+        return self.cur.flush()
 
     def _maybe_switch(self):
-        if time.time() - self.last_switch > 30:
-            self.cur = self._select()
-            self.last_switch = time.time()
+        kind = self.controller.choice()
+        if kind != self.kind:
+            self.cur.flush()  # do not strand an open batching window
+            nxt = self._get(kind)
+            nxt.import_warm(self.cur.export_warm())
+            self.kind, self.cur = kind, nxt
+
+    def _observe(self, t0, is_read, cid, hits_before):
+        hit = (self.cur.lookup_hits() > hits_before) if is_read and self.kind in ('PD', 'HC') else None
+        self.controller.observe(t0, is_read, cid, (self.clock.time() - t0)*1000.0, hit)
+
+    def cache_tiers(self):
+        # every strategy the pool has run, so cache stats cover the whole run and not just the last one
+        return {tier: c for s in self._pool.values() for tier, c in s.cache_tiers().items()}
 
     def read(self, cid: str):
         self._maybe_switch()
-        return self.cur.read(cid)
+        t0, h0 = self.clock.time(), self.cur.lookup_hits()
+        res = self.cur.read(cid)
+        self._observe(t0, True, cid, h0)
+        return res
 
     def write(self, cid: str, data: str) -> bool:
         self._maybe_switch()
-        return self.cur.write(cid, data)
+        t0 = self.clock.time()
+        ok = self.cur.write(cid, data)
+        self.last_conflict, self.last_retries = self.cur.last_conflict, self.cur.last_retries
+        self._observe(t0, False, cid, 0)
+        return ok
+
+    async def aread(self, cid: str):
+        self._maybe_switch()
+        t0, h0 = self.clock.time(), self.cur.lookup_hits()
+        res = await self.cur.aread(cid)
+        self._observe(t0, True, cid, h0)
+        return res
+
+    async def awrite(self, cid: str, data: str):
+        self._maybe_switch()
+        t0 = self.clock.time()
+        res = await self.cur.awrite(cid, data)
+        self._observe(t0, False, cid, 0)
+        return res
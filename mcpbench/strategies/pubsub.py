@@ -9,14 +9,21 @@ class PubSub(Strategy):
         return f"t{hash(cid)%256}"
 
     def read(self, cid: str):
+        topic = self._topic(cid)
+        if topic not in self.topic_cache:
+            self.topic_cache[topic] = True
+            self.router.subscribe(self.agent_id, topic)
         item = self.store.read(cid)
-        m = self.router.poll(self.agent_id)
-        while m:
-            m = self.router.poll(self.agent_id)
-        stale = 2.0 if item else 0.0
-        return item, stale
+        self.router.poll_all(self.agent_id)
+        return item
 
-    def write(self, cid: str, data: str) -> bool:
-        item = self.store.write(cid, data)
-        self.router.publish(self._topic(cid), {'type':'update','cid':cid,'version':item.version})
-        return True
+    def on_commit(self, cid: str, item):
+        self._pend(cid, item)
+        self.flush_if_due()
+
+    def _send(self, updates):
+        by_topic = {}
+        for u in updates:
+            by_topic.setdefault(self._topic(u['cid']), []).append(u)
+        for topic, us in by_topic.items():
+            self.router.publish_many(topic, us)
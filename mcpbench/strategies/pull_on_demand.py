@@ -1,4 +1,3 @@
-import time
 from .base import Strategy
 
 class PullOnDemand(Strategy):
@@ -6,16 +5,34 @@ class PullOnDemand(Strategy):
         super().__init__(agent_id, store, router)
         self.ttl = ttl_seconds
         self.cache = {}  # cid -> (item, fetched_at)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0  # entries refetched after their TTL expired
 
     def read(self, cid: str):
-        now = time.time()
-        if cid in self.cache and now - self.cache[cid][1] < self.ttl:
-            item = self.cache[cid][0]
-            return item, (now - item.updated_at)*1000.0 if item else 0.0
+        now = self.clock.time()
+        e = self.cache.get(cid)
+        if e is not None and now - e[1] < self.ttl:
+            self.hits += 1
+            return e[0]
+        self.misses += 1
+        if e is not None:
+            self.evictions += 1
         item = self.store.read(cid)
         self.cache[cid] = (item, now)
-        return item, (now - item.updated_at)*1000.0 if item else 0.0
+        return item
+
+    def cache_tiers(self):
+        return {'pd': self}  # the TTL cache's counters live on the strategy
+
+    def export_warm(self):
+        now = self.clock.time()
+        live = [(cid, e) for cid, e in self.cache.items() if e[0] is not None and now - e[1] < self.ttl]
+        live.sort(key=lambda x: x[1][1])
+        return [(cid, e[0]) for cid, e in live]
+
+    def import_warm(self, entries):
+        now = self.clock.time()
+        for cid, item in entries:
+            self.cache[cid] = (item, now)
 
-    def write(self, cid: str, data: str) -> bool:
-        self.store.write(cid, data)
-        return True
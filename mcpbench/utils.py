@@ -1,4 +1,5 @@
-import random, time
+import itertools, random, time
+import numpy as np
 
 class RNG:
     def __init__(self, seed: int):
@@ -10,5 +11,41 @@ class RNG:
     def random(self):
         return self.rng.random()
 
-def sleep_ms(ms):
-    time.sleep(ms/1000.0)
+def sleep_ms(ms, clock=None):
+    if clock is None:
+        time.sleep(ms/1000.0)
+    else:
+        clock.sleep(ms/1000.0)
+
+def bootstrap_ci(samples, n_boot: int = 1000, level: float = 0.95, seed: int = 0):
+    """Percentile bootstrap CI of the mean, all resamples drawn in one array."""
+    lo, hi = bootstrap_cis(np.asarray(samples, dtype=np.float64)[:, None], n_boot, level, seed)
+    return float(lo[0]), float(hi[0])
+
+def bootstrap_cis(samples, n_boot: int = 1000, level: float = 0.95, seed: int = 0):
+    """Per-column percentile bootstrap CIs of the mean for an (n, k) sample matrix.
+
+    One (n_boot, n) resample index matrix is shared by all k columns, so metrics measured on the
+    same runs are resampled together; returns (lo, hi) arrays of length k (NaN when n < 2)."""
+    x = np.asarray(samples, dtype=np.float64)
+    if x.shape[0] < 2:
+        return np.full(x.shape[1], np.nan), np.full(x.shape[1], np.nan)
+    idx = np.random.default_rng(seed).integers(0, x.shape[0], size=(n_boot, x.shape[0]))
+    lo, hi = np.quantile(x[idx].mean(axis=1), [(1 - level) / 2, (1 + level) / 2], axis=0)
+    return lo, hi
+
+def pairwise_welch(df, metric: str = 'p95', by: str = 'strategy'):
+    """Welch t-test of `metric` between every pair of `by` groups with >1 sample (Bonferroni over pairs)."""
+    import pandas as pd
+    from scipy import stats
+    labels = [k for k, g in df.groupby(by) if len(g) > 1]
+    pairs = list(itertools.combinations(labels, 2))
+    m = len(pairs)
+    rows = []
+    for a, b in pairs:
+        xa = df[df[by]==a][metric].values
+        xb = df[df[by]==b][metric].values
+        t, p = stats.ttest_ind(xa, xb, equal_var=False)
+        rows.append({'A':a,'B':b,'mean_A':float(xa.mean()),'mean_B':float(xb.mean()),
+                     't':float(t),'p_raw':float(p),'p_bonf':float(min(1.0, p*m))})
+    return pd.DataFrame(rows, columns=['A','B','mean_A','mean_B','t','p_raw','p_bonf'])
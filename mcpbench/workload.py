@@ -1,46 +1,80 @@
-import random
+import bisect, random
+import numpy as np
 
 class AccessSampler:
     def __init__(self, n_items: int, kind: str, zipf_alpha: float=0.99, hotspot_fraction:float=0.05, hotspot_share:float=0.5, seed:int=42):
         self.rng = random.Random(seed)
+        self.np_rng = np.random.default_rng(seed)
         self.n = n_items
         self.kind = kind
         if kind == 'zipf':
-            ranks = range(1, n_items+1)
-            weights = [1/(r**zipf_alpha) for r in ranks]
-            s = sum(weights)
-            self.p = [w/s for w in weights]
+            weights = 1.0 / np.arange(1, n_items+1, dtype=np.float64)**zipf_alpha
+            self.cdf = np.cumsum(weights / weights.sum())
+            self.cdf[-1] = 1.0
+            self._cdf = self.cdf.tolist()  # bisect on a list beats numpy scalar calls
         elif kind == 'hotspot':
             self.hot_n = max(1, int(n_items * hotspot_fraction))
-            self.hot_ids = list(range(self.hot_n))
-            self.cold_ids = list(range(self.hot_n, n_items))
-            self.hot_p = hotspot_share / self.hot_n
-            self.cold_p = (1 - hotspot_share) / max(1, (n_items - self.hot_n))
+            self.cold_n = max(1, n_items - self.hot_n)
+            self.hotspot_share = hotspot_share
 
     def sample(self):
         if self.kind == 'zipf':
-            x = self.rng.random(); c=0
-            for i,p in enumerate(self.p):
-                c += p
-                if x <= c:
-                    return i
-            return self.n-1
+            return min(bisect.bisect_left(self._cdf, self.rng.random()), self.n-1)
         elif self.kind == 'hotspot':
-            if self.rng.random() < 0.5:
-                return self.rng.choice(self.hot_ids)
-            return self.rng.choice(self.cold_ids)
+            if self.rng.random() < self.hotspot_share:
+                return self.rng.randrange(self.hot_n)
+            return self.hot_n + self.rng.randrange(self.cold_n)
         else:
             return self.rng.randrange(self.n)
 
+    def sample_batch(self, k: int) -> np.ndarray:
+        g = self.np_rng
+        if self.kind == 'zipf':
+            ids = np.searchsorted(self.cdf, g.random(k), side='left')
+            return np.minimum(ids, self.n-1, out=ids)
+        elif self.kind == 'hotspot':
+            hot = g.random(k) < self.hotspot_share
+            return np.where(hot, g.integers(0, self.hot_n, size=k), self.hot_n + g.integers(0, self.cold_n, size=k))
+        else:
+            return g.integers(0, self.n, size=k)
+
+    def iter_ids(self, block: int = 4096):
+        while True:
+            yield from self.sample_batch(block).tolist()
+
 class Workload:
-    def __init__(self, kind: str, ops_per_sec: int, read_ratio: float):
+    ARRIVALS = ('closed', 'constant', 'poisson', 'bursty')
+
+    def __init__(self, kind: str, ops_per_sec: int, read_ratio: float, arrival: str='closed',
+                 burst_ops_per_sec: float=None, seed: int=None):
+        if arrival not in self.ARRIVALS:
+            raise ValueError(f"unknown arrival process: {arrival}")
         self.kind = kind
         self.ops_per_sec = ops_per_sec
         self.read_ratio = read_ratio
+        self.arrival = arrival
+        self.burst_ops_per_sec = burst_ops_per_sec or 2 * ops_per_sec
+        self.rng = random.Random(seed)
 
     def next_op(self, t: float):
         if self.kind == 'BU':
             burst = 2 if int(t) % 30 < 10 else 1
-            return burst, 'read' if random.random() < 0.5 else 'write'
+            return burst, 'read' if self.rng.random() < 0.5 else 'write'
         else:
-            return 1, 'read' if random.random() < self.read_ratio else 'write'
+            return 1, 'read' if self.rng.random() < self.read_ratio else 'write'
+
+    def next_kind(self) -> str:
+        rr = 0.5 if self.kind == 'BU' else self.read_ratio
+        return 'read' if self.rng.random() < rr else 'write'
+
+    def rate(self, t: float) -> float:
+        # bursty: same 10s-in-every-30s window the closed-loop BU workload uses
+        if self.arrival == 'bursty' and int(t) % 30 < 10:
+            return self.burst_ops_per_sec
+        return self.ops_per_sec
+
+    def next_gap(self, t: float) -> float:
+        r = max(1e-9, self.rate(t))
+        if self.arrival == 'constant':
+            return 1.0 / r
+        return self.rng.expovariate(r)
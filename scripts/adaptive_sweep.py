@@ -0,0 +1,121 @@
+# scripts/adaptive_sweep.py
+"""Adaptive campaign over a config grid.
+
+Every active cell (one config) runs a short round with early stopping; per-window p95 and
+throughput from its manifests are pooled across rounds. A cell stops once the bootstrap CIs
+of both pooled means are narrow, or once another strategy in its comparison group (same
+config apart from mcp.strategy) beats it on p95 by Welch t-test without losing throughput.
+Only the remaining cells get another round.
+"""
+import argparse, copy, glob, json, os, sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import yaml
+from mcpbench.utils import bootstrap_ci, pairwise_welch
+
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+
+def _run_one(cfg: dict):
+    from mcpbench.runner import run_experiment
+    run_experiment(cfg)
+
+def group_key(cfg) -> str:
+    c = copy.deepcopy(cfg)
+    for k in ('run_id', 'results_dir'):
+        c.pop(k, None)
+    c['mcp'].pop('strategy', None)
+    return json.dumps(c, sort_keys=True, default=str)
+
+def round_cfg(cfg, r, args):
+    c = copy.deepcopy(cfg)
+    c['run_id'] = f"{cfg['run_id']}_r{r}"
+    c['results_dir'] = args.out
+    c['seed'] = cfg.get('seed', 42) + r
+    m = c['measurement']
+    m['measure_seconds'] = args.round_seconds
+    m['early_stop'] = {**(m.get('early_stop') or {}), 'enabled': True,
+                       'rel_ci_width': args.rel_ci, 'abs_ci_ms': args.abs_ci_ms}
+    return c
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--glob', required=True, help='Grid configs (e.g., "configs/generated/*.yaml")')
+    ap.add_argument('--out', default='results/adaptive')
+    ap.add_argument('--workers', type=int, default=1)
+    ap.add_argument('--round-seconds', type=float, default=60, help='Measure budget per cell per round')
+    ap.add_argument('--max-rounds', type=int, default=5)
+    ap.add_argument('--rel-ci', type=float, default=0.1, help='Stop a cell at this relative 95%% CI width')
+    ap.add_argument('--abs-ci-ms', type=float, default=0.1)
+    ap.add_argument('--alpha', type=float, default=0.05, help='Welch dominance threshold (Bonferroni per group)')
+    args = ap.parse_args()
+
+    cells = {}
+    for p in sorted(glob.glob(args.glob)):
+        with open(p) as f:
+            cfg = yaml.safe_load(f)
+        cells[cfg['run_id']] = {'cfg': cfg, 'group': group_key(cfg), 'status': 'active',
+                                'rounds': 0, 'p95': [], 'throughput': []}
+    Path(args.out).mkdir(parents=True, exist_ok=True)
+
+    for r in range(args.max_rounds):
+        active = [rid for rid, c in cells.items() if c['status'] == 'active']
+        if not active:
+            break
+        runs = {rid: round_cfg(cells[rid]['cfg'], r, args) for rid in active}
+        pool_kw = {'max_tasks_per_child': 1} if sys.version_info >= (3, 11) else {}  # new in 3.11
+        with ProcessPoolExecutor(max_workers=max(1, args.workers), **pool_kw) as ex:
+            futs = {rid: ex.submit(_run_one, c) for rid, c in runs.items()}
+        for rid, fut in futs.items():
+            c = cells[rid]
+            try:
+                fut.result()
+                m = json.loads((Path(args.out)/"agg"/f"{runs[rid]['run_id']}.manifest.json").read_text())
+            except Exception as e:
+                print(f"[ERROR] {rid} round {r}: {e}", file=sys.stderr)
+                c['status'] = 'failed'
+                continue
+            c['rounds'] += 1
+            for w in m['measure']['windows']:
+                c['p95'].append(w['p95']); c['throughput'].append(w['throughput'])
+
+        # converged: both pooled CIs narrow enough
+        for rid in active:
+            c = cells[rid]
+            if c['status'] != 'active' or len(c['p95']) < 2:
+                continue
+            widths = [np.subtract(*bootstrap_ci(c[k])[::-1]) for k in ('p95', 'throughput')]
+            if (widths[0] <= max(args.rel_ci * np.mean(c['p95']), args.abs_ci_ms)
+                    and widths[1] <= args.rel_ci * np.mean(c['throughput'])):
+                c['status'] = 'converged'
+
+        # dominated: significantly worse p95 than a sibling strategy, and no better throughput
+        by_group = {}
+        for rid, c in cells.items():
+            if c['status'] in ('active', 'converged') and len(c['p95']) > 1:
+                by_group.setdefault(c['group'], []).append(rid)
+        for rids in by_group.values():
+            if len(rids) < 2:
+                continue
+            long = pd.DataFrame([{'cell': rid, 'p95': v} for rid in rids for v in cells[rid]['p95']])
+            for row in pairwise_welch(long, 'p95', 'cell').itertuples():
+                if row.p_bonf >= args.alpha:
+                    continue
+                worse, better = (row.A, row.B) if row.mean_A > row.mean_B else (row.B, row.A)
+                if (cells[worse]['status'] == 'active'
+                        and np.mean(cells[worse]['throughput']) <= np.mean(cells[better]['throughput'])):
+                    cells[worse]['status'] = 'dominated'
+
+        status = pd.DataFrame([{
+            'run_id': rid, 'strategy': c['cfg']['mcp']['strategy'], 'status': c['status'], 'rounds': c['rounds'],
+            'windows': len(c['p95']), 'p95_mean': np.mean(c['p95']) if c['p95'] else np.nan,
+            'throughput_mean': np.mean(c['throughput']) if c['throughput'] else np.nan,
+        } for rid, c in cells.items()])
+        status.to_csv(Path(args.out)/"campaign.csv", index=False)
+        print(f"round {r}: ran {len(active)}; " + ", ".join(f"{k}={v}" for k, v in status['status'].value_counts().items()))
+
+    print("Wrote", Path(args.out)/"campaign.csv")
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,7 @@
 # scripts/run_all_experiments.py
-import argparse, glob, os, sys
-from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse, glob, json, os, sys, time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
 from time import perf_counter
 
 # Avoid NumPy/BLAS thread oversubscription per worker
@@ -9,40 +10,175 @@ os.environ.setdefault("OPENBLAS_NUM_THREADS", "1")
 os.environ.setdefault("MKL_NUM_THREADS", "1")
 os.environ.setdefault("NUMEXPR_NUM_THREADS", "1")
 
-def _run_one(cfg_path: str):
+def _run_one(cfg_paths: list, journal_path=None, starts=()):
     # Import inside worker to keep state isolated in each process
-    from mcpbench.runner import run_experiment
-    return run_experiment(cfg_path)
+    from mcpbench.runner import run_experiment, run_family
+    if journal_path is not None:
+        # logged once the task actually runs, so a crash leaves queued configs unmarked
+        j = Journal(journal_path)
+        for p, (run_id, attempt) in zip(cfg_paths, starts):
+            j.log('started', p, run_id=run_id, attempt=attempt)
+        j.close()
+    t = perf_counter()
+    if len(cfg_paths) == 1:
+        run_experiment(cfg_paths[0])
+    else:
+        run_family(cfg_paths)
+    return perf_counter() - t
+
+def _outputs(cfg):
+    rs, rid = Path(cfg['results_dir']), cfg['run_id']
+    return rs/"raw"/f"{rid}.parquet", rs/"agg"/f"{rid}.manifest.json"
+
+def is_done(cfg) -> bool:
+    """A run counts as done when its parquet footer and manifest both read back."""
+    import pyarrow.parquet as pq
+    raw, manifest = _outputs(cfg)
+    try:
+        pq.read_metadata(raw)
+        json.loads(manifest.read_text())
+        return True
+    except Exception:
+        return False
+
+def expected_cost(cfgs) -> float:
+    # agent-seconds of simulated time: a proxy for wall time that orders long jobs first;
+    # a forked family pays init + warmup once
+    m = cfgs[0]['measurement']
+    warm = m.get('init_seconds', 0) + m.get('warmup_seconds', 0)
+    return cfgs[0]['agents']['count'] * (warm + sum(
+        c['measurement'].get('measure_seconds', 0) + c['measurement'].get('cooldown_seconds', 0) for c in cfgs))
+
+class Journal:
+    """Append-only JSONL progress log; one line per scheduling event."""
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = open(self.path, 'a', buffering=1)
+
+    def log(self, event: str, cfg_path: str, **fields):
+        self._f.write(json.dumps({'ts': time.time(), 'event': event, 'config': cfg_path, **fields}) + "\n")
+
+    def close(self):
+        self._f.close()
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument('--config', help='Single YAML config path')
     ap.add_argument('--glob', help='Glob for multiple YAML configs (e.g., "configs/generated/*.yaml")')
     ap.add_argument('--workers', type=int, default=1, help='Number of parallel workers (processes)')
+    ap.add_argument('--retries', type=int, default=2, help='Re-run a failed config up to this many times')
+    ap.add_argument('--max-tasks-per-child', type=int, default=1,
+                    help='Recycle a worker process after this many runs (class-level caches do not leak; '
+                         'Python 3.11+, ignored with --workers 1)')
+    ap.add_argument('--journal', default=None, help='Progress journal (default: <results_dir>/journal.jsonl)')
+    ap.add_argument('--force', action='store_true', help='Re-run configs whose outputs already exist')
+    ap.add_argument('--fork-after-warmup', action='store_true',
+                    help='Warm up once per group of configs differing only in workload, fork per config')
     args = ap.parse_args()
 
     if args.config:
-        cfgs = [args.config]
+        paths = [args.config]
     elif args.glob:
-        cfgs = sorted(glob.glob(args.glob))
+        paths = sorted(glob.glob(args.glob))
     else:
         raise SystemExit('Provide --config or --glob')
+    if not paths:
+        print(f"No configs match {args.glob}; completed 0 run(s)")
+        return
+
+    from mcpbench.config import load_config
+    cfgs = {p: load_config(p) for p in paths}
+    journal = Journal(args.journal or Path(next(iter(cfgs.values()))['results_dir'])/"journal.jsonl")
+
+    todo = []
+    for p, cfg in cfgs.items():
+        if not args.force and is_done(cfg):
+            journal.log('skipped', p, run_id=cfg['run_id'])
+        else:
+            todo.append(p)
+    if args.fork_after_warmup:
+        from mcpbench.runner import warm_key
+        groups = {}
+        for p in todo:
+            groups.setdefault(warm_key(cfgs[p]), []).append(p)
+        tasks = list(groups.values())
+    else:
+        tasks = [[p] for p in todo]
+    tasks.sort(key=lambda g: expected_cost([cfgs[p] for p in g]), reverse=True)
+    print(f"{len(todo)} to run in {len(tasks)} task(s), {len(paths) - len(todo)} already complete")
 
     t0 = perf_counter()
-    if args.workers <= 1 or len(cfgs) == 1:
-        for c in cfgs:
-            _run_one(c)
+    failed = []
+    attempts = {}
+    done_n = 0
+
+    def start(group):
+        for p in group:
+            attempts[p] = attempts.get(p, 0) + 1
+        return (group, journal.path, [(cfgs[p]['run_id'], attempts[p]) for p in group])
+
+    def finish(group, secs, err):
+        """Journal a finished task; returns the configs to retry."""
+        nonlocal done_n
+        retry = []
+        for p in group:
+            # a failed family may still have finished some siblings
+            if err is None or is_done(cfgs[p]):
+                done_n += 1
+                journal.log('done', p, run_id=cfgs[p]['run_id'], attempt=attempts[p],
+                            seconds=round(secs, 3) if secs is not None else None)
+                print(f"[{done_n}/{len(todo)}] {p}" + (f" in {secs:.1f}s" if secs is not None else ""))
+                continue
+            journal.log('failed', p, run_id=cfgs[p]['run_id'], attempt=attempts[p], error=repr(err))
+            print(f"[ERROR] {p} (attempt {attempts[p]}): {err}", file=sys.stderr)
+            if attempts[p] <= args.retries:
+                retry.append(p)
+            else:
+                failed.append(p)
+        return retry
+
+    if args.workers <= 1:
+        # in-process, one task at a time
+        queue = list(tasks)
+        while queue:
+            group = queue.pop(0)
+            try:
+                secs, err = _run_one(*start(group)), None
+            except Exception as e:
+                secs, err = None, e
+            retry = finish(group, secs, err)
+            if retry:
+                queue.append(retry)
     else:
-        with ProcessPoolExecutor(max_workers=args.workers) as ex:
-            futs = {ex.submit(_run_one, c): c for c in cfgs}
-            for fut in as_completed(futs):
-                c = futs[fut]
-                try:
-                    fut.result()
-                except Exception as e:
-                    print(f"[ERROR] {c}: {e}", file=sys.stderr)
+        pool_kw = {}
+        if sys.version_info >= (3, 11):  # max_tasks_per_child is new in 3.11
+            pool_kw['max_tasks_per_child'] = args.max_tasks_per_child
+        with ProcessPoolExecutor(max_workers=args.workers, **pool_kw) as ex:
+            pending = {}
+
+            def submit(group):
+                pending[ex.submit(_run_one, *start(group))] = group
+
+            for g in tasks:
+                submit(g)
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    group = pending.pop(fut)
+                    try:
+                        secs, err = fut.result(), None
+                    except Exception as e:
+                        secs, err = None, e
+                    retry = finish(group, secs, err)
+                    if retry:
+                        submit(retry)
+    journal.close()
     dt = perf_counter() - t0
-    print(f"Completed {len(cfgs)} run(s) in {dt:.2f}s with workers={args.workers}")
+    print(f"Completed {len(todo) - len(failed)} run(s) in {dt:.2f}s with workers={args.workers}"
+          + (f"; {len(failed)} failed: {', '.join(failed)}" if failed else ""))
+    if failed:
+        sys.exit(1)
 
 if __name__ == '__main__':
     main()